@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""bench_launch.py [<runs>]
+
+Time how long `run_in_background` blocks the calling process.
+
+This is the latency a Script Filter pays when it triggers an update.
+All runners are measured: ``fork`` (double-fork from the calling
+process), ``script`` (call ``background.py`` in a new interpreter) and
+``worker`` (send job to the resident worker, which is started by the
+first run). The job itself is a no-op. Each run waits for the previous job to
+finish, so none is skipped as "already running".
+
+Usage:
+    bench_launch.py [<runs>]
+
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+RUNNERS = ('fork', 'script', 'worker')
+
+# Command run by the background jobs
+COMMAND = ['/usr/bin/true' if os.path.exists('/usr/bin/true') else '/bin/true']
+
+
+def wait_for(name):
+    """Wait until job ``name`` has finished."""
+    from workflow.background import is_running, wf
+
+    while True:
+        wf().state.invalidate()
+        if not is_running(name):
+            return
+        time.sleep(0.01)
+
+
+def timeit(runner, runs):
+    """Start ``runs`` jobs with ``runner`` and return sorted timings."""
+    from workflow.background import run_in_background
+
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        run_in_background('bench-' + runner, COMMAND, runner=runner)
+        times.append(time.time() - start)
+        wait_for('bench-' + runner)
+
+    return sorted(times)
+
+
+def main():
+    """Run benchmarks."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    # Keep the benchmark's files out of the workflow's directories
+    tmpdir = tempfile.mkdtemp()
+    os.environ.update({
+        'alfred_workflow_bundleid': 'net.deanishe.bench-launch',
+        'alfred_workflow_cache': os.path.join(tmpdir, 'cache'),
+        'alfred_workflow_data': os.path.join(tmpdir, 'data'),
+    })
+    os.chdir(SRC)
+    sys.path.insert(0, SRC)
+
+    from workflow.worker import stop
+
+    try:
+        print('{0:<10}  {1:>10}  {2:>10}'.format('runner', 'median ms',
+                                                'min ms'))
+        for runner in RUNNERS:
+            times = timeit(runner, runs)
+            print('{0:<10}  {1:>10.3f}  {2:>10.3f}'.format(
+                runner, times[len(times) // 2] * 1000, times[0] * 1000))
+    finally:
+        stop()
+        # The worker may still be writing its log
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""bench_lock.py [<readers>] [<seconds>]
+
+Measure how long `LockFile` waits for a lock under contention.
+
+One writer process repeatedly holds an exclusive lock for a few
+milliseconds, like `Settings.save` during an update. Meanwhile,
+``<readers>`` processes (default: 4) repeatedly lock the same file,
+like Script Filter runs loading the settings. Print the distribution
+of the readers' waiting times, first with exclusive locks and then
+(if `LockFile` supports them) with shared ones.
+
+Usage:
+    bench_lock.py [<readers>] [<seconds>]
+
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# How long the writer holds the lock and waits between writes
+HOLD = 0.003  # seconds
+GAP = 0.010  # seconds
+
+# How long readers hold the lock and wait between reads
+READ = 0.0005  # seconds
+PAUSE = 0.002  # seconds
+
+WRITER = '''
+import sys, time
+sys.path.insert(0, {src!r})
+from workflow.util import LockFile
+end = time.time() + {seconds}
+lock = LockFile({path!r})
+while time.time() < end:
+    with lock:
+        time.sleep({hold})
+    time.sleep({gap})
+'''
+
+READER = '''
+import json, sys, time
+sys.path.insert(0, {src!r})
+from workflow.util import LockFile
+end = time.time() + {seconds}
+kwargs = {{'shared': True}} if {shared} else {{}}
+waits = []
+while time.time() < end:
+    lock = LockFile({path!r}, **kwargs)
+    start = time.time()
+    lock.acquire()
+    waits.append(time.time() - start)
+    time.sleep({read})
+    lock.release()
+    time.sleep({pause})
+print(json.dumps(waits))
+'''
+
+
+def supports_shared():
+    """Return ``True`` if `LockFile` has shared locks."""
+    sys.path.insert(0, SRC)
+    from workflow.util import LockFile
+    try:
+        LockFile(os.devnull, shared=True)
+    except TypeError:
+        return False
+    return True
+
+
+def run(readers, seconds, shared, path):
+    """Run writer and readers and return readers' waiting times."""
+    params = dict(src=SRC, seconds=seconds, path=path, hold=HOLD, gap=GAP,
+                  read=READ, pause=PAUSE, shared=shared)
+    writer = subprocess.Popen([sys.executable, '-c',
+                               WRITER.format(**params)])
+    procs = [subprocess.Popen([sys.executable, '-c', READER.format(**params)],
+                              stdout=subprocess.PIPE)
+             for _ in range(readers)]
+
+    waits = []
+    for proc in procs:
+        waits.extend(json.loads(proc.communicate()[0]))
+    writer.wait()
+
+    return sorted(waits)
+
+
+def main():
+    """Run benchmarks."""
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'settings.json')
+
+    modes = [('exclusive', False)]
+    if supports_shared():
+        modes.append(('shared', True))
+
+    try:
+        print('{0:<10}  {1:>7}  {2:>8}  {3:>8}  {4:>8}  {5:>8}'.format(
+            'readers', 'locks', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+        for label, shared in modes:
+            waits = run(readers, seconds, shared, path)
+            pc = [waits[min(int(len(waits) * q), len(waits) - 1)] * 1000
+                  for q in (0.5, 0.9, 0.99)]
+            print('{0:<10}  {1:>7}  {2:>8.3f}  {3:>8.3f}  {4:>8.3f}  '
+                  '{5:>8.3f}'.format(label, len(waits), pc[0], pc[1], pc[2],
+                                     waits[-1] * 1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""bench_serializers.py [<size>...]
+
+Compare the registered cache serializers on the workflow's payloads.
+
+For each payload and serializer, print the median time to dump the
+payload, to load it and to load it and access every record (which is
+what matters for lazy stores like `repostore`), and the size of the
+resulting file. Payloads are a generated list of repos of each given
+size (default: 1k, 10k, 50k, 200k), the update status and a background
+job's argument cache.
+
+Serializers that can't handle a payload are skipped.
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from workflow import manager  # noqa: E402
+from repostore import Repo  # noqa: E402
+
+# How many times to run each operation
+RUNS = 5
+
+DEFAULT_SIZES = (1000, 10000, 50000, 200000)
+
+
+def make_repos(n):
+    """Generate ``n`` repos in a plausible directory layout."""
+    repos = []
+    for i in xrange(n):
+        owner = u'user{0}'.format(i % 97)
+        name = u'project-{0}'.format(i)
+        path = u'/Users/dean/Code/{0}/{1}/{2}'.format(i % 13, owner, name)
+        repos.append(Repo(name, path))
+
+    return repos
+
+
+def payloads(sizes):
+    """Yield ``(name, data, repos)`` tuples to benchmark.
+
+    ``repos`` is ``True`` if ``data`` is a list of `Repo` tuples.
+    """
+    for n in sizes:
+        yield 'repos-{0}k'.format(n // 1000), make_repos(n), True
+
+    yield 'update-status', {
+        'available': True,
+        'version': u'3.2.0',
+        'download': {
+            'url': u'https://github.com/deanishe/alfred-repos/releases/'
+                   u'download/v3.2.0/Git-Repos-3.2.0.alfred4workflow',
+            'filename': u'Git-Repos-3.2.0.alfred4workflow',
+            'version': u'3.2.0',
+            'prerelease': False,
+        },
+    }, False
+
+    yield 'argcache', {
+        'args': [u'/usr/bin/python', u'update.py'],
+        'kwargs': {},
+    }, False
+
+
+def plain(data):
+    """Convert `Repo` tuples to plain tuples."""
+    return [tuple(r) for r in data]
+
+
+def median(times):
+    """Return median of ``times``."""
+    return sorted(times)[len(times) // 2]
+
+
+def bench(serializer, data, path):
+    """Return median dump, load and load+access times and file size."""
+    dumps = []
+    loads = []
+    fulls = []
+    for _ in range(RUNS):
+        start = time.time()
+        with open(path, 'wb') as fp:
+            serializer.dump(data, fp)
+        dumps.append(time.time() - start)
+
+        start = time.time()
+        with open(path, 'rb') as fp:
+            obj = serializer.load(fp)
+        loads.append(time.time() - start)
+        # Force lazy stores to decode everything
+        if isinstance(data, list):
+            list(obj)
+        fulls.append(time.time() - start)
+
+    return median(dumps), median(loads), median(fulls), os.path.getsize(path)
+
+
+def main():
+    """Run benchmarks."""
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    path = os.path.join(tempfile.mkdtemp(), 'bench.cache')
+
+    print('{0:<14}  {1:<10}  {2:>9}  {3:>9}  {4:>9}  {5:>9}'.format(
+          'payload', 'serializer', 'dump ms', 'load ms', 'full ms', 'KiB'))
+
+    for name, data, is_repos in payloads(sizes):
+        for sname in manager.serializers:
+            if sname == 'repostore':
+                if not is_repos:
+                    continue
+                obj = data
+            elif is_repos:
+                obj = plain(data)
+            else:
+                obj = data
+
+            dump, load, full, size = bench(manager.serializer(sname), obj,
+                                           path)
+            print('{0:<14}  {1:<10}  {2:>9.2f}  {3:>9.2f}  {4:>9.2f}  '
+                  '{5:>9.1f}'.format(name, sname, dump * 1000, load * 1000,
+                                     full * 1000, size / 1024.0))
+        print()
+
+    os.unlink(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
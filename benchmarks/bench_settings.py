@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""bench_settings.py [<runs>]
+
+Count the file operations done by typical changes to `Settings`.
+
+For each scenario, print how many times the settings file was renamed
+into place (i.e. rewritten), how many times it was fsynced and the
+median time the changes took. Scenarios:
+
+    migrate      the v1 -> v2 migration in `repos.py` (6 sets and 6
+                 deletes), one change at a time
+    migrate (batch)
+                 the same inside `Settings.batch()`
+    no-op        setting 6 keys to their current values
+
+Usage:
+    bench_settings.py [<runs>]
+
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from workflow.workflow import Settings  # noqa: E402
+
+# Settings in v1 format: numbered apps
+V1 = {'app_{0}'.format(i): 'App {0}'.format(i) for i in range(1, 7)}
+V1['search_dirs'] = [{'path': '~/Code', 'depth': 2}]
+
+NEWKEYS = ('default', 'cmd', 'alt', 'ctrl', 'shift', 'fn')
+
+
+def migrate(s):
+    """Rename numbered apps like `repos.migrate_v1_config`."""
+    for i, nk in enumerate(NEWKEYS, 1):
+        s['app_' + nk] = s.get('app_{0}'.format(i))
+        del s['app_{0}'.format(i)]
+
+
+def migrate_batch(s):
+    """Rename numbered apps in a batch."""
+    with s.batch():
+        migrate(s)
+
+
+def noop(s):
+    """Set keys to the values they already have."""
+    for key in sorted(s)[:6]:
+        s[key] = s[key]
+
+
+SCENARIOS = [
+    ('migrate', migrate),
+    ('migrate (batch)', migrate_batch),
+    ('no-op', noop),
+]
+
+
+class Counter(object):
+    """Count calls to functions in `os`."""
+
+    def __init__(self, *names):
+        """Wrap functions ``names``."""
+        self.counts = dict.fromkeys(names, 0)
+        self._orig = {}
+        for name in names:
+            self._orig[name] = func = getattr(os, name)
+            setattr(os, name, self._wrap(name, func))
+
+    def _wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            self.counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def reset(self):
+        """Reset counts to zero."""
+        for name in self.counts:
+            self.counts[name] = 0
+
+    def restore(self):
+        """Unwrap functions."""
+        for name, func in self._orig.items():
+            setattr(os, name, func)
+
+
+def main():
+    """Run benchmarks."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'settings.json')
+    counter = Counter('rename', 'fsync')
+
+    try:
+        print('{0:<16}  {1:>7}  {2:>6}  {3:>10}'.format(
+            'scenario', 'renames', 'fsyncs', 'median ms'))
+        for label, func in SCENARIOS:
+            times = []
+            for _ in range(runs):
+                with open(path, 'wb') as fp:
+                    json.dump(V1, fp)
+                s = Settings(path)
+                counter.reset()
+                start = time.time()
+                func(s)
+                times.append(time.time() - start)
+
+            times.sort()
+            print('{0:<16}  {1:>7}  {2:>6}  {3:>10.3f}'.format(
+                label, counter.counts['rename'], counter.counts['fsync'],
+                times[len(times) // 2] * 1000))
+    finally:
+        counter.restore()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
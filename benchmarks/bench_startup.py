@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""bench_startup.py [<runs>]
+
+Time the startup-critical parts of a Script Filter run.
+
+Each measurement runs in a fresh interpreter, so import costs are
+included, just as they are when Alfred runs the workflow.
+
+Usage:
+    bench_startup.py [<runs>]
+
+"""
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Parse the same command line with docopt and the dispatch table
+SNIPPETS = [
+    ('argv: docopt', '''
+from docopt import docopt
+docopt(repos.__doc__, ['search', 'alfred'])
+'''),
+    ('argv: dispatch', '''
+args = repos.dispatch(['search', 'alfred'])
+'''),
+]
+
+TEMPLATE = '''
+import sys, time
+sys.path.insert(0, {src!r})
+import repos
+start = time.time()
+{code}
+sys.stdout.write(repr(time.time() - start))
+'''
+
+
+def timeit(code, runs):
+    """Run ``code`` in ``runs`` fresh interpreters and return timings."""
+    script = TEMPLATE.format(src=SRC, code=code)
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=SRC)
+        times.append(float(output))
+
+    return sorted(times)
+
+
+def main():
+    """Run benchmarks."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print('{0:<20}  {1:>10}  {2:>10}'.format('benchmark', 'median ms',
+                                            'min ms'))
+    for name, code in SNIPPETS:
+        times = timeit(code, runs)
+        print('{0:<20}  {1:>10.3f}  {2:>10.3f}'.format(
+            name, times[len(times) // 2] * 1000, times[0] * 1000))
+
+
+if __name__ == '__main__':
+    main()
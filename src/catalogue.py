@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""SQLite-backed repo catalogue with full-text search.
+
+An alternative to the ``repostore`` cache for very large setups,
+selected with ``"backend": "sqlite"`` in ``settings.json``.
+
+`update.py` upserts the repos it finds, so unchanged rows are left
+alone. Searches fetch a limited set of candidates from a full-text
+index (FTS5, FTS4 or, failing that, ``LIKE``) whose tokens are the
+words in the repo's name and path, and the workflow's usual scoring
+is then only applied to those candidates.
+"""
+
+from __future__ import print_function, absolute_import
+
+from array import array
+import os
+import re
+import sqlite3
+
+from workflow.workflow import CacheHeader
+
+from repostore import INDEXED, Repo, RepoList, repo_dirs
+from typos import split_words
+
+# Maximum number of candidates to fetch for a query
+CANDIDATES = 1000
+
+# Weights of the `name` and `words` columns of the full-text index
+# when ranking candidates, so repos whose name matches come first
+RANK_WEIGHTS = (2.0, 1.0)
+
+# How long to wait for the database if another process has locked it
+BUSY_TIMEOUT = 2000  # milliseconds
+
+# Columns of `repos` table holding `Repo` fields
+COLUMNS = u', '.join(Repo._fields)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    root TEXT NOT NULL,
+    host TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+"""
+
+
+def words(repo):
+    """Return full-text tokens for ``repo``.
+
+    Args:
+        repo (Repo): Repo to tokenise.
+
+    Returns:
+        unicode: Space-separated words from name, directories and
+            remote.
+
+    """
+    tokens = split_words(repo.name)
+    tokens.extend((repo_dirs(repo), repo.owner, repo.host))
+    return u' '.join(tokens)
+
+
+def like(value):
+    """Return ``LIKE`` pattern matching strings containing ``value``."""
+    for c in u'\\%_':
+        value = value.replace(c, u'\\' + c)
+    return u'%{0}%'.format(value)
+
+
+def fts4_rank(matchinfo):
+    """Return relevance of an FTS4 match. Higher is better.
+
+    Like the ``rank`` function in the SQLite FTS4 documentation: sums
+    the hits of each phrase in each column of the row, divided by its
+    hits in that column of all rows and weighted by `RANK_WEIGHTS`.
+
+    Args:
+        matchinfo (buffer): ``matchinfo(repos_fts, 'pcx')`` of row.
+
+    Returns:
+        float: Relevance of row.
+
+    """
+    info = array('I', bytes(matchinfo))
+    phrases, columns = info[0], info[1]
+    score = 0.0
+    for i in range(phrases * columns):
+        hits, total = info[2 + 3 * i], info[3 + 3 * i]
+        if hits:
+            score += RANK_WEIGHTS[i % columns] * hits / float(total)
+
+    return score
+
+
+def fts_query(query):
+    """Convert user query to an FTS prefix query.
+
+    Args:
+        query (unicode): Search query.
+
+    Returns:
+        unicode: FTS query or ``None`` if query contains no words.
+
+    """
+    tokens = [s.lower() for s in re.split(r'\W+', query, flags=re.UNICODE)
+              if s]
+    if not tokens:
+        return None
+
+    return u' '.join(u'{0}*'.format(s) for s in tokens)
+
+
+class Catalogue(object):
+    """Repos stored in an SQLite database.
+
+    Supports the same interface as `repostore.RepoStore`.
+
+    Args:
+        path (str): Path to database file.
+
+    """
+
+    def __init__(self, path):
+        """Create new `Catalogue`."""
+        self.path = path
+        self._conn = None
+        self._fts = None
+
+    @property
+    def conn(self):
+        """Connection to the database."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA busy_timeout = {0:d}'.format(BUSY_TIMEOUT))
+            # Readers don't block writers and vice versa, so searches
+            # can run while `update.py` writes
+            try:
+                conn.execute('PRAGMA journal_mode = WAL')
+            except sqlite3.OperationalError:  # pragma: no cover
+                pass  # database busy; use the rollback journal this time
+            conn.create_function('fts4_rank', 1, fts4_rank)
+            self._conn = conn
+        return self._conn
+
+    @property
+    def fts(self):
+        """Full-text module used by index table (or ``None``)."""
+        if self._fts is None:
+            row = self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'repos_fts'"
+            ).fetchone()
+            self._fts = u''
+            if row:
+                self._fts = u'fts5' if u'fts5' in row[0].lower() else u'fts4'
+        return self._fts or None
+
+    def header(self):
+        """Return `CacheHeader` from catalogue's metadata.
+
+        Returns:
+            CacheHeader: Metadata or ``None`` if catalogue doesn't exist.
+
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            meta = dict(self.conn.execute('SELECT key, value FROM meta'))
+        except sqlite3.DatabaseError:  # empty or invalid database
+            return None
+
+        if 'schema' not in meta:
+            return None
+
+        return CacheHeader(meta['schema'], meta.get('count'),
+                           meta.get('created'), meta.get('source'))
+
+    def update(self, repos, schema, source, created):
+        """Replace catalogue contents with ``repos``.
+
+        Only added, removed and changed repos are written. If the
+        catalogue has a different schema, it is rebuilt.
+
+        Args:
+            repos (list): Sequence of `Repo` tuples.
+            schema (int): Format version of catalogue.
+            source (unicode): Hash of settings ``repos`` were found with.
+            created (float): Time of update.
+
+        """
+        header = self.header()
+        with self.conn as conn:
+            if header and header.schema != schema:
+                conn.executescript('DROP TABLE meta; DROP TABLE repos; '
+                                   'DROP TABLE IF EXISTS repos_fts;')
+                self._fts = None
+
+            conn.executescript(SCHEMA)
+            if not self.fts:
+                self._create_index(conn)
+
+            existing = {row[2]: (row[0], Repo(*row[1:])) for row
+                        in conn.execute('SELECT id, {0} FROM repos'.format(
+                            COLUMNS))}
+
+            for r in repos:
+                if r.path in existing:
+                    id_, old = existing.pop(r.path)
+                    if old == r:
+                        continue
+
+                    conn.execute('UPDATE repos SET {0} WHERE id = ?'.format(
+                        u', '.join(s + u' = ?' for s in Repo._fields)),
+                        r + (id_,))
+                    self._unindex(conn, id_)
+                else:
+                    sql = 'INSERT INTO repos ({0}) VALUES ({1})'.format(
+                        COLUMNS, ', '.join('?' * len(r)))
+                    id_ = conn.execute(sql, r).lastrowid
+
+                self._index(conn, id_, r)
+
+            for id_, _ in existing.values():
+                conn.execute('DELETE FROM repos WHERE id = ?', (id_,))
+                self._unindex(conn, id_)
+
+            meta = {'schema': schema, 'source': source, 'created': created,
+                    'count': len(repos)}
+            conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                             meta.items())
+
+    def candidates(self, query, qualifiers=(), limit=CANDIDATES):
+        """Return repos that may match ``query``.
+
+        Args:
+            query (unicode): Search query.
+            qualifiers (list, optional): ``(field, value)`` tuples.
+                Only repos whose ``field`` (one of `INDEXED`) contains
+                ``value`` are returned.
+            limit (int, optional): Maximum number of candidates.
+
+        Returns:
+            RepoList: Candidate repos, most relevant first, so the
+                ones cut off by ``limit`` are the least likely to
+                match.
+
+        """
+        where = []
+        params = []
+        for field, value in qualifiers:
+            if field not in INDEXED:
+                raise ValueError('not an indexed field: {0!r}'.format(field))
+            where.append(u"r.{0} LIKE ? ESCAPE '\\'".format(field))
+            params.append(like(value))
+
+        q = fts_query(query)
+        if q is None:
+            if not where:
+                return RepoList()
+            sql = 'SELECT {0} FROM repos r WHERE {1} LIMIT ?'
+
+        elif self.fts == u'fts5':
+            sql = ('SELECT {0} FROM repos_fts f '
+                   'JOIN repos r ON r.id = f.rowid '
+                   'WHERE repos_fts MATCH ? AND {1} '
+                   'ORDER BY bm25(repos_fts, {2}) LIMIT ?')
+        elif self.fts == u'fts4':
+            sql = ('SELECT {0} FROM repos_fts f '
+                   'JOIN repos r ON r.id = f.rowid '
+                   'WHERE repos_fts MATCH ? AND {1} '
+                   "ORDER BY fts4_rank(matchinfo(repos_fts, 'pcx')) DESC "
+                   'LIMIT ?')
+        else:  # no full-text search; match substring of name
+            # Shorter names containing the query are closer matches
+            sql = ("SELECT {0} FROM repos r WHERE r.name LIKE ? ESCAPE '\\' "
+                   "AND {1} ORDER BY length(r.name) LIMIT ?")
+            q = like(query.strip())
+
+        if q is not None:
+            params.insert(0, q)
+
+        sql = sql.format(u', '.join(u'r.' + s for s in Repo._fields),
+                         u' AND '.join(where) or u'1',
+                         u', '.join(str(w) for w in RANK_WEIGHTS))
+
+        return RepoList(Repo(*row) for row in
+                        self.conn.execute(sql, params + [limit]))
+
+    def __len__(self):
+        """Number of repos in catalogue."""
+        return self.conn.execute('SELECT COUNT(*) FROM repos').fetchone()[0]
+
+    def __iter__(self):
+        """Iterate over all repos."""
+        for row in self.conn.execute('SELECT {0} FROM repos '
+                                     'ORDER BY id'.format(COLUMNS)):
+            yield Repo(*row)
+
+    def _create_index(self, conn):
+        """Create full-text index with the best available module."""
+        for module in (u'fts5', u'fts4'):
+            try:
+                conn.execute('CREATE VIRTUAL TABLE repos_fts '
+                             'USING {0}(name, words)'.format(module))
+            except sqlite3.OperationalError:  # module not available
+                continue
+
+            self._fts = module
+            return
+
+        self._fts = u''
+
+    def _index(self, conn, id_, repo):
+        """Add ``repo`` to full-text index."""
+        if self.fts:
+            conn.execute('INSERT INTO repos_fts (rowid, name, words) '
+                         'VALUES (?, ?, ?)', (id_, repo.name, words(repo)))
+
+    def _unindex(self, conn, id_):
+        """Remove repo ``id_`` from full-text index."""
+        if self.fts:
+            conn.execute('DELETE FROM repos_fts WHERE rowid = ?', (id_,))
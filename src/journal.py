@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Journal of changes to the list of repos.
+
+Every update that changes the list of repos appends a record with a
+new generation number and the differences to the previous list:
+
+    add       ``(ADDED, repo)``
+    remove    ``(REMOVED, path)``
+    move      ``(MOVED, old path, repo)``, i.e. a repo disappeared
+              from one path and appeared at another (see `diff`)
+    change    ``(CHANGED, repo)``, i.e. another field (e.g. branch or
+              status) changed
+
+where ``repo`` is a `Repo` tuple. Something that is derived from the
+list of repos can remember the generation it was built from and then
+apply the events since that generation instead of being rebuilt.
+
+The journal is a file of marshalled ``(generation, time, events)``
+records. The first record is ``(generation, time, None)`` and marks
+the point from which the journal is complete: events from earlier
+generations are unknown, either because the journal was truncated
+or because the list of repos was rebuilt from scratch.
+
+Writers (`update.py` and the watcher) hold an exclusive lock on the
+journal while they add a generation, so generation numbers are unique.
+"""
+
+from __future__ import print_function, absolute_import
+
+from collections import defaultdict
+import marshal
+import os
+import time
+
+from workflow.util import LockFile, atomic_writer
+
+from repostore import Repo
+
+# Filename of journal in cache directory
+JOURNAL_NAME = 'repos.journal'
+
+# Number of generations kept when the journal is truncated
+MAX_GENERATIONS = 100
+
+# Event types
+ADDED = 'add'
+REMOVED = 'remove'
+MOVED = 'move'
+CHANGED = 'change'
+
+
+def by_name(repo):
+    """Return name and remote of ``repo`` (``None`` if it has no remote).
+
+    Repos without a remote can't be told apart by anything but their
+    path, so they aren't considered moved.
+    """
+    if not repo.host:
+        return None
+
+    return repo.name, repo.host, repo.owner
+
+
+def by_remote(repo):
+    """Return remote of ``repo`` (``None`` if it has no remote)."""
+    if not repo.host:
+        return None
+
+    return repo.host, repo.owner
+
+
+def pair(removed, added, key):
+    """Pair ``removed`` and ``added`` repos with the same ``key``.
+
+    Repos whose key is shared by more than one removed or added repo
+    are ambiguous and aren't paired.
+
+    Args:
+        removed (list): Removed `Repo` tuples. Paired repos are removed.
+        added (list): Added `Repo` tuples. Paired repos are removed.
+        key (callable): Returns key of a repo or ``None``.
+
+    Returns:
+        list: ``(removed repo, added repo)`` tuples.
+
+    """
+    groups = defaultdict(lambda: ([], []))
+    for r in removed:
+        groups[key(r)][0].append(r)
+    for r in added:
+        groups[key(r)][1].append(r)
+
+    pairs = [(old[0], new[0]) for k, (old, new) in groups.items()
+             if k is not None and len(old) == len(new) == 1]
+    gone = {r.path for p in pairs for r in p}
+    removed[:] = [r for r in removed if r.path not in gone]
+    added[:] = [r for r in added if r.path not in gone]
+    return pairs
+
+
+def diff(old, new):
+    """Return events that turn repos ``old`` into repos ``new``.
+
+    A repo that disappeared from one path and a repo that appeared at
+    another are considered moved if they have the same name and
+    remote, or failing that (i.e. the directory was renamed), the
+    same remote and no other removed or added repo has it.
+
+    Args:
+        old (iterable): Previous `Repo` tuples.
+        new (iterable): Current `Repo` tuples.
+
+    Returns:
+        list: Events, removals first.
+
+    """
+    previous = {r.path: r for r in old}
+    added = []
+    changed = []
+    for r in new:
+        p = previous.pop(r.path, None)
+        if p is None:
+            added.append(r)
+        elif p != r:
+            changed.append(r)
+
+    removed = previous.values()
+    moves = pair(removed, added, by_name) + pair(removed, added, by_remote)
+
+    return ([(REMOVED, r.path) for r in removed] +
+            [(MOVED, o.path, tuple(r)) for o, r in moves] +
+            [(ADDED, tuple(r)) for r in added] +
+            [(CHANGED, tuple(r)) for r in changed])
+
+
+def event_repo(event):
+    """Return ``event`` with its `Repo` (if any) as a `Repo` tuple."""
+    kind = event[0]
+    if kind in (ADDED, CHANGED):
+        return kind, Repo(*event[1])
+    if kind == MOVED:
+        return kind, event[1], Repo(*event[2])
+    return tuple(event)
+
+
+class Journal(object):
+    """Append-only journal of changes to the list of repos.
+
+    Args:
+        dirpath (str): Directory to store journal in.
+
+    """
+
+    def __init__(self, dirpath):
+        """Create new `Journal`."""
+        self.path = os.path.join(dirpath, JOURNAL_NAME)
+        self._records = None
+
+    @property
+    def records(self):
+        """``(generation, time, events)`` records in journal."""
+        if self._records is None:
+            self._records = []
+            try:
+                with open(self.path, 'rb') as fp:
+                    while True:
+                        try:
+                            self._records.append(marshal.load(fp))
+                        except EOFError:
+                            break
+            except IOError:  # not created yet
+                pass
+            except ValueError:  # partially-written record
+                pass
+
+        return self._records
+
+    @property
+    def generation(self):
+        """Current generation (0 if journal is empty)."""
+        if not self.records:
+            return 0
+        return self.records[-1][0]
+
+    def since(self, generation):
+        """Return events after ``generation``.
+
+        Args:
+            generation (int): Generation the caller is up to date with.
+
+        Returns:
+            list: ``(generation, event)`` tuples, oldest first, or
+                ``None`` if the journal doesn't go back that far and
+                the caller must rebuild from the list of repos.
+
+        """
+        records = self.records
+        if not records or generation < records[0][0]:
+            return None
+
+        events = []
+        for gen, _, evs in records[1:]:
+            if gen > generation:
+                events.extend((gen, event_repo(e)) for e in evs)
+
+        return events
+
+    def append(self, events, when=None):
+        """Record ``events`` as a new generation.
+
+        Args:
+            events (list): Events returned by `diff`.
+            when (float, optional): Time of update. Defaults to now.
+
+        Returns:
+            int: New generation or current one if ``events`` is empty.
+                If the journal doesn't exist yet, it is started (see
+                `reset`) and ``events`` are ignored.
+
+        """
+        with LockFile(self.path):
+            # Another process may have added a generation since the
+            # journal was read
+            self._records = None
+            return self._append(events, when)
+
+    def _append(self, events, when):
+        """Add generation. Caller must hold the journal's lock."""
+        if not self.records:
+            return self._reset(when)
+
+        if not events:
+            return self.generation
+
+        when = time.time() if when is None else when
+        generation = self.generation + 1
+        record = (generation, when, events)
+        if len(self.records) > MAX_GENERATIONS:
+            self._rewrite(self.records[-MAX_GENERATIONS:] + [record])
+        else:
+            with open(self.path, 'ab') as fp:
+                marshal.dump(record, fp, 2)
+            self.records.append(record)
+
+        return generation
+
+    def reset(self, when=None):
+        """Start new journal, e.g. because the repos were rebuilt.
+
+        Callers that are behind the new generation must rebuild.
+
+        Args:
+            when (float, optional): Time of update. Defaults to now.
+
+        Returns:
+            int: New generation.
+
+        """
+        with LockFile(self.path):
+            self._records = None
+            return self._reset(when)
+
+    def _reset(self, when):
+        """Start new journal. Caller must hold the journal's lock."""
+        when = time.time() if when is None else when
+        generation = self.generation + 1
+        self._rewrite([(generation, when, None)])
+        return generation
+
+    def _rewrite(self, records):
+        """Replace journal with ``records``. Caller must hold the lock."""
+        # Earliest generation is now only a marker
+        gen, when, _ = records[0]
+        records = [(gen, when, None)] + records[1:]
+        with atomic_writer(self.path, 'wb') as fp:
+            for record in records:
+                marshal.dump(record, fp, 2)
+
+        self._records = records
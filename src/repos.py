@@ -24,21 +24,97 @@ Options:
 
 from __future__ import print_function
 
-from collections import namedtuple
+from array import array
+from hashlib import md5
+import json
 import os
 import re
 import subprocess
 import sys
 import time
 
-from workflow import Workflow3, ICON_WARNING, ICON_INFO
-from workflow.background import is_running, run_in_background
+from workflow import Workflow3, ICON_WARNING, ICON_INFO, MATCH_ALL
+from workflow import MATCH_ALLCHARS
+from workflow.background import is_running, job_status, run_in_background
 from workflow.update import Version
+from workflow.workflow import isascii
+
+# Also registers `repostore` serializer
+from repostore import Repo
+import typos
+from usage import Usage
 
 
 # How often to check for new/updated repos
 DEFAULT_UPDATE_INTERVAL = 180  # minutes
 
+# Format version of the repos cache. Increment when it changes.
+REPOS_SCHEMA = 7
+
+# Settings the repos cache is generated from
+SOURCE_SETTINGS = ('search_dirs', 'global_exclude_patterns', 'backend',
+                   'index_status')
+
+# Value of `backend` setting that stores repos in an SQLite catalogue
+BACKEND_SQLITE = 'sqlite'
+
+# Filename of SQLite catalogue in cache directory
+CATALOGUE_NAME = 'repos.sqlite'
+
+# Command that updates the cached list of repos
+UPDATE_CMD = ['/usr/bin/python', 'update.py']
+
+# How long an update may run before it's terminated
+UPDATE_DEADLINE = 600  # seconds
+
+# Command that watches search directories for new and deleted repos
+WATCH_CMD = ['/usr/bin/python', 'update.py', 'watch']
+
+# How much matches on a repo's directories, owner and host (see
+# `repostore.search_key`) count compared to matches on its name
+SEARCH_WEIGHT = 0.8
+
+# Shortest query that is matched against directories, owner and host.
+# Single characters match most of them.
+SEARCH_MIN_LENGTH = 2
+
+# Query qualifiers and the indexed fields they restrict the search by.
+# Qualifiers with a value match that value regardless of the query.
+QUALIFIERS = {
+    'host': ('host', None),
+    'owner': ('owner', None),
+    'branch': ('branch', None),
+    'root': ('root', None),
+    'status': ('status', None),
+    'dirty': ('status', u'dirty'),
+    'clean': ('status', u'clean'),
+}
+
+# Look for misspelt words if a query matches fewer repos
+TYPO_THRESHOLD = 3
+
+# Score of a repo whose words are 1 edit away from the query's.
+# Halved for each further edit.
+TYPO_SCORE = 20
+
+# Bounds of the interval at which Alfred re-runs the Script Filter
+# while an update is running (Alfred accepts 0.1-5.0)
+RERUN_MIN = 0.5
+RERUN_MAX = 5.0
+
+# How many queries to cache the results of
+MAX_CACHED_QUERIES = 100
+
+# How many matching repos to show (and cache) for a query. Catalogues
+# return at most `catalogue.CANDIDATES` anyway.
+MAX_RESULTS = 1000
+
+# Most points frequently-opened repos get added to their search score
+USAGE_WEIGHT = 20
+
+# How many query prefixes to remember the opened repo for
+MAX_SHORTCUTS = 500
+
 # GitHub repo for self-updating
 UPDATE_SETTINGS = {'github_slug': 'deanishe/alfred-repos'}
 
@@ -78,13 +154,20 @@ DEFAULT_SETTINGS = {
     'app_fn': None,
 }
 
+# Command lines handled without docopt. Maps each command to its
+# required and optional positional arguments. Anything else (options,
+# wrong number of arguments) is passed to docopt.
+COMMANDS = {
+    'search': ((), ('<query>',)),
+    'settings': ((), ()),
+    'update': ((), ()),
+    'open': (('<appkey>', '<path>'), ()),
+}
+
 # Will be populated later
 log = None
 
 
-Repo = namedtuple('Repo', 'name path')
-
-
 class AttrDict(dict):
     """Access dictionary keys as attributes."""
 
@@ -109,13 +192,14 @@ def migrate_v1_config():
         '5': 'shift',
         '6': 'fn',
     }
-    for k, nk in newkeys.items():
-        wf.settings['app_' + nk] = wf.settings.get('app_' + k)
-        try:
-            del wf.settings['app_' + k]
-            log.debug('changed `app_%s` to `app_%s`', k, nk)
-        except KeyError:
-            pass
+    with wf.settings.batch():
+        for k, nk in newkeys.items():
+            wf.settings['app_' + nk] = wf.settings.get('app_' + k)
+            try:
+                del wf.settings['app_' + k]
+                log.debug('changed `app_%s` to `app_%s`', k, nk)
+            except KeyError:
+                pass
 
 
 def is_defaults(d):
@@ -128,17 +212,18 @@ def is_defaults(d):
     return len(dirs) == 1 and dirs[0]['path'] == DEFAULT_SEARCH_PATH
 
 
-def settings_updated():
-    """Test whether settings file is newer than repos cache.
+def settings_hash(settings):
+    """Return hash of the settings the repos cache is generated from.
+
+    Args:
+        settings (dict): Workflow settings.
 
     Returns:
-        bool: ``True`` if ``settings.json`` is newer than the repos cache.
+        unicode: Hex digest of relevant settings.
 
     """
-    cache_age = wf.cached_data_age('repos')
-    settings_age = time.time() - os.stat(wf.settings_path).st_mtime
-    log.debug('cache_age=%0.2f, settings_age=%0.2f', cache_age, settings_age)
-    return settings_age < cache_age
+    data = {k: settings.get(k) for k in SOURCE_SETTINGS}
+    return unicode(md5(json.dumps(data, sort_keys=True)).hexdigest())
 
 
 def join_english(items):
@@ -188,24 +273,112 @@ def get_repos(opts):
         opts (AttrDict): CLI options
 
     Returns:
-        list: Sequence of `Repo` tuples.
+        tuple: `RepoStore` of repos, whether an update is running and
+            the generation (creation time) of the cache.
 
     """
-    # Load data, update if necessary
-    if not wf.cached_data_fresh('repos', max_age=opts.update_interval):
+    if wf.settings.get('backend') == BACKEND_SQLITE:
+        return get_catalogue(opts)
+
+    # Check whether cache is compatible and up to date
+    header = wf.cached_data_header('repos', 'repostore')
+    if header is None or header.schema != REPOS_SCHEMA:
+        do_update()
+        return [], is_running('update'), None
+
+    # Reload repos if settings have been changed
+    if header.source != settings_hash(wf.settings):
+        log.info('settings were updated. Reloading repos...')
         do_update()
-    repos = wf.cached_data('repos', max_age=0)
+
+    # Load data, update in background if necessary
+    try:
+        repos, updating = wf.cached_data_background(
+            'repos', UPDATE_CMD, max_age=opts.update_interval,
+            job='update', serializer='repostore', deadline=UPDATE_DEADLINE,
+            every=opts.update_interval)
+    except ValueError as err:  # invalid cache file
+        log.warning('could not load cached repos: %s', err)
+        repos = None
 
     if not repos:
         do_update()
-        return []
+        return [], is_running('update'), None
+
+    return repos, updating, header.created
+
+
+def get_catalogue(opts):
+    """Open SQLite catalogue, triggering an update if necessary.
+
+    Args:
+        opts (AttrDict): CLI options
+
+    Returns:
+        tuple: `Catalogue` of repos, whether an update is running and
+            ``None`` (results from catalogues aren't cached).
+
+    """
+    from catalogue import Catalogue
+
+    cat = Catalogue(wf.cachefile(CATALOGUE_NAME))
+    header = cat.header()
+    if header is None or header.schema != REPOS_SCHEMA:
+        do_update()
+        return [], is_running('update'), None
 
-    # Check if cached data is old version
-    if isinstance(repos[0], basestring):
+    if header.source != settings_hash(wf.settings):
+        log.info('settings were updated. Reloading repos...')
         do_update()
-        return []
+    elif time.time() - header.created > opts.update_interval:
+        do_update()
+
+    if not header.count:
+        return [], is_running('update'), None
+
+    return cat, is_running('update'), None
 
-    return repos
+
+def get_shortcut(query):
+    """Return repo last opened for ``query``.
+
+    Args:
+        query (unicode): Search query.
+
+    Returns:
+        Repo: Repo or ``None`` if none was opened (or it's gone).
+
+    """
+    shortcuts = wf.stored_data('shortcuts') or {}
+    shortcut = shortcuts.get(query.lower())
+    if not shortcut or not os.path.exists(shortcut[1]):
+        return None
+
+    return Repo(shortcut[0], shortcut[1])
+
+
+def record_shortcut(query, repo):
+    """Remember ``repo`` for ``query`` and all its prefixes.
+
+    Only the `MAX_SHORTCUTS` most recently used prefixes are kept.
+
+    Args:
+        query (unicode): Query repo was found with.
+        repo (Repo): Repo that was opened.
+
+    """
+    shortcuts = wf.stored_data('shortcuts') or {}
+    query = query.lower()
+    now = time.time()
+    for i in range(1, len(query) + 1):
+        shortcuts[query[:i]] = (repo.name, repo.path, now)
+
+    if len(shortcuts) > MAX_SHORTCUTS:
+        lru = sorted(shortcuts, key=lambda k: shortcuts[k][2])
+        for k in lru[:len(shortcuts) - MAX_SHORTCUTS]:
+            del shortcuts[k]
+
+    wf.store_data('shortcuts', shortcuts, serializer='marshal')
 
 
 def repo_url(path):
@@ -243,6 +416,16 @@ def do_open(opts):
     if not isinstance(apps, list):
         apps = [apps]
 
+    Usage(wf.datadir).record(opts.path)
+    # Cached results are ranked by usage, too
+    wf.cache_data('results', None, serializer='marshal')
+
+    # Set by `do_search`
+    query = wf.decode(os.getenv('query') or u'').strip()
+    name = wf.decode(os.getenv('repo_name') or u'')
+    if query and name:
+        record_shortcut(query, Repo(name, opts.path))
+
     for app in apps:
         if app in BROWSERS:
             url = repo_url(opts.path)
@@ -270,26 +453,343 @@ def do_settings():
     return 0
 
 
-def do_update():
+def start_watcher():
+    """Start watching search directories if enabled and not running."""
+    if wf.settings.get('watch') and not is_running('watch'):
+        # Runs for hours, so don't tie up a worker thread with it
+        run_in_background('watch', WATCH_CMD, runner='fork')
+
+
+def do_update(queue=False):
     """Update cached list of git repos.
 
     Args:
-        opts (AttrDict): CLI options.
+        queue (bool, optional): If an update is already running,
+            run another one when it's finished.
 
     Returns:
         int: Exit status.
 
     """
-    run_in_background('update', ['/usr/bin/python', 'update.py'])
+    run_in_background('update', UPDATE_CMD, queue=queue,
+                      deadline=UPDATE_DEADLINE)
     return 0
 
 
-def do_search(repos, opts):
+def rerun_interval():
+    """Return how long Alfred should wait before re-running.
+
+    Aims to re-run halfway through the expected remaining time of the
+    running update. If that is unknown or already over, the interval
+    grows with the time the update has been running.
+
+    Returns:
+        float: Seconds between `RERUN_MIN` and `RERUN_MAX`.
+
+    """
+    status = job_status('update')
+    if status is None:
+        return RERUN_MIN
+
+    if status['eta']:
+        interval = status['eta'] / 2
+    else:  # unknown or overdue
+        interval = status['elapsed'] / 4
+
+    return min(max(interval, RERUN_MIN), RERUN_MAX)
+
+
+def update_progress():
+    """Describe progress of running update.
+
+    Returns:
+        unicode: Phase, items processed and time remaining.
+
+    """
+    status = job_status('update')
+    if not status or status['eta'] is None and not status['phase']:
+        return u'Should be done in a few seconds'
+
+    parts = [(status['phase'] or u'starting').capitalize()]
+    if status['total']:
+        parts.append(u'{0}/{1}'.format(status['done'] or 0, status['total']))
+    if status['eta'] is not None:
+        parts.append(u'about {0:0.0f}s left'.format(status['eta'] + 0.5))
+
+    return u' · '.join(parts)
+
+
+def parse_query(query):
+    """Split qualifiers like ``host:github`` from free text.
+
+    Args:
+        query (unicode): Search query.
+
+    Returns:
+        tuple: Free text and list of ``(field, value)`` qualifiers.
+
+    """
+    text = []
+    qualifiers = []
+    for word in query.split():
+        name, sep, value = word.partition(u':')
+        if not sep or name.lower() not in QUALIFIERS:
+            text.append(word)
+            continue
+
+        field, fixed = QUALIFIERS[name.lower()]
+        value = fixed or value
+        if value:
+            qualifiers.append((field, value))
+
+    return u' '.join(text), qualifiers
+
+
+def select_repos(repos, qualifiers):
+    """Return indices of repos matching all ``qualifiers``.
+
+    Args:
+        repos (RepoStore): Sequence of ``Repo`` tuples.
+        qualifiers (list): ``(field, value)`` tuples.
+
+    Returns:
+        list: Sorted indices of matching repos.
+
+    """
+    ids = None
+    for field, value in qualifiers:
+        found = repos.lookup(field, value)
+        ids = found if ids is None else ids & found
+        if not ids:
+            break
+
+    return sorted(ids)
+
+
+def score_repos(repos, query, ids=None):
+    """Score repos against ``query`` on name and other fields.
+
+    Indices are scored, so only matching repos are fully decoded, and
+    repos the store's index shows can't match (see `RepoStore.prefilter`)
+    aren't decoded at all. Repos whose names match aren't scored on
+    their other fields (directories, owner and host), which are
+    combined into one precomputed search key worth `SEARCH_WEIGHT`
+    of the name. Queries shorter than `SEARCH_MIN_LENGTH` only match
+    names.
+
+    Args:
+        repos (RepoStore): Sequence of ``Repo`` tuples.
+        query (unicode): Search query.
+        ids (list, optional): Indices of repos to score. Defaults to
+            all repos.
+
+    Returns:
+        dict: Mapping of index to best weighted score of each matching
+            repo.
+
+    """
+    # Precomputed ASCII keys are only equivalent to the names
+    # if the names would be folded anyway
+    fold = wf.settings.get('__workflow_diacritic_folding', True)
+    key = repos.name
+    if isascii(query) and fold:
+        key = repos.key
+
+    # For a one-word query, a match on all characters scores at most
+    # 100 / (len(query) + 1) and an earlier rule matches whenever it
+    # could reach `min_score`. It's also the slowest rule.
+    match_on = MATCH_ALL
+    if len(query.split()) == 1:
+        match_on ^= MATCH_ALLCHARS
+
+    if ids is None:
+        ids = xrange(len(repos))
+
+    scores = {i: score for i, score, _ in
+              wf.filter(query, repos.prefilter(query, ids, fold=fold),
+                        key, include_score=True, min_score=30,
+                        match_on=match_on)}
+
+    if len(query.strip()) < SEARCH_MIN_LENGTH:
+        return scores
+
+    rest = [i for i in repos.prefilter(query, ids, True, fold)
+            if i not in scores]
+    for i, score, _ in wf.filter(query, rest, repos.search,
+                                 include_score=True, min_score=30,
+                                 match_on=match_on):
+        scores[i] = score * SEARCH_WEIGHT
+
+    return scores
+
+
+def typo_repos(repos, query, ids=None):
+    """Score repos with words in their names similar to ``query``'s.
+
+    Every word in ``query`` long enough to be indexed must be similar
+    to a word in the repo's name.
+
+    Args:
+        repos (RepoStore): Sequence of ``Repo`` tuples.
+        query (unicode): Search query.
+        ids (list, optional): Indices of repos to consider. Defaults
+            to all repos.
+
+    Returns:
+        dict: Mapping of index to score of each matching repo.
+
+    """
+    words = typos.atoms(wf.fold_to_ascii(query))
+    if not words:
+        return {}
+
+    found = None
+    for word in words:
+        matches = repos.similar(word, typos.max_distance(word))
+        if found is None:
+            found = matches
+        else:
+            found = {i: d + matches[i] for i, d in found.items()
+                     if i in matches}
+
+    if ids is not None:
+        ids = set(ids)
+        found = {i: d for i, d in found.items() if i in ids}
+
+    return {i: TYPO_SCORE / 2.0 ** (d - 1) for i, d in found.items()}
+
+
+def rank_repos(repos, query):
+    """Find and rank repos matching ``query``.
+
+    Args:
+        repos (RepoStore): Sequence of ``Repo`` tuples.
+        query (unicode): Search query.
+
+    Returns:
+        tuple: Searched repos (catalogues return only candidates) and
+            list of indices of matching repos, best first.
+
+    """
+    text, qualifiers = parse_query(query)
+
+    # Catalogues only score the repos found by a full-text search
+    # and apply qualifiers in the same query
+    if hasattr(repos, 'candidates'):
+        repos = repos.candidates(text, qualifiers)
+        log.debug(u'%d candidate repos for `%s`', len(repos), query)
+        qualifiers = []
+
+    # Restrict search to repos matching qualifiers before scoring
+    ids = None
+    if qualifiers:
+        ids = select_repos(repos, qualifiers)
+        log.debug(u'%d/%d repos match %r', len(ids), len(repos), qualifiers)
+
+    if text:
+        scores = score_repos(repos, text, ids)
+        if len(scores) < TYPO_THRESHOLD and hasattr(repos, 'similar'):
+            for i, score in typo_repos(repos, text, ids).items():
+                scores.setdefault(i, score)
+    else:
+        if ids is None:
+            ids = xrange(len(repos))
+        scores = dict.fromkeys(ids, 0)
+
+    log.debug(u'%d/%d repos match `%s`', len(scores), len(repos), query)
+
+    # Boost frequently and recently opened repos
+    usage = Usage(wf.datadir)
+    ranked = []
+    for i, score in scores.items():
+        frecency = usage.score(repos.path(i))
+        score += USAGE_WEIGHT * frecency / (frecency + 1)
+        ranked.append((-score, i))
+
+    ranked.sort()
+    return repos, [i for _, i in ranked]
+
+
+def normalise_query(query):
+    """Return ``query`` in the form used as a key for cached results."""
+    return u' '.join(query.lower().split())
+
+
+def load_results(generation):
+    """Load cached results.
+
+    Args:
+        generation (float): Generation of repos cache.
+
+    Returns:
+        dict: Cached results, empty if they are from another
+            generation. Pass to `cached_results` and `cache_results`.
+
+    """
+    data = wf.cached_data('results', max_age=0, serializer='marshal')
+    if not data or data['generation'] != generation:
+        data = {'generation': generation, 'queries': []}
+
+    return data
+
+
+def cached_results(data, query):
+    """Return cached results for ``query``.
+
+    Args:
+        data (dict): Cached results returned by `load_results`.
+        query (unicode): Search query.
+
+    Returns:
+        list: Indices of matching repos, best first, or ``None`` if
+            results for ``query`` aren't cached.
+
+    """
+    query = normalise_query(query)
+    queries = data['queries']
+    for n, (q, ids) in enumerate(queries):
+        if q == query:
+            break
+    else:
+        return None
+
+    # Mark as most recently used, unless it already is
+    if n != len(queries) - 1:
+        queries.append(queries.pop(n))
+        wf.cache_data('results', data, serializer='marshal')
+
+    log.debug(u'cached results for `%s`', query)
+    return array(b'I', ids).tolist()
+
+
+def cache_results(data, query, ids):
+    """Cache results for ``query``.
+
+    Only the results of the `MAX_CACHED_QUERIES` most recently used
+    queries are kept.
+
+    Args:
+        data (dict): Cached results returned by `load_results`.
+        query (unicode): Search query.
+        ids (list): Indices of matching repos, best first (at most
+            `MAX_RESULTS`).
+
+    """
+    query = normalise_query(query)
+    queries = [t for t in data['queries'] if t[0] != query]
+    queries.append((query, array(b'I', ids).tostring()))
+    data['queries'] = queries[-MAX_CACHED_QUERIES:]
+    wf.cache_data('results', data, serializer='marshal')
+
+
+def do_search(repos, opts, generation=None):
     """Filter list of repos and show results in Alfred.
 
     Args:
-        repos (list): Sequence of ``Repo`` tuples.
+        repos (RepoStore): Sequence of ``Repo`` tuples.
         opts (AttrDict): CLI options.
+        generation (float, optional): Generation of ``repos``. If set,
+            results are cached.
 
     Returns:
         int: Exit status.
@@ -308,15 +808,33 @@ def do_search(repos, opts):
             valid[key] = True
 
     if opts.query:
-        repos = wf.filter(opts.query, repos, lambda t: t[0], min_score=30)
-        log.info(u'%d/%d repos match `%s`', len(repos), len(repos), opts.query)
+        results = ids = None
+        if generation is not None:
+            results = load_results(generation)
+            ids = cached_results(results, opts.query)
+
+        if ids is None:
+            repos, ids = rank_repos(repos, opts.query)
+            ids = ids[:MAX_RESULTS]
+            if results is not None:
+                cache_results(results, opts.query, ids)
+
+        repos = [repos[i] for i in ids]
+
+        # Put repo last opened for this query first
+        pinned = get_shortcut(opts.query)
+        if pinned:
+            log.debug(u'pinned `%s` for `%s`', pinned.path, opts.query)
+            repos = [pinned] + [r for r in repos if r.path != pinned.path]
 
     if not repos:
         wf.add_item('No matching repos found', icon=ICON_WARNING)
 
     home = os.environ['HOME']
+    debug = wf.debugging
     for r in repos:
-        log.debug(r)
+        if debug:
+            log.debug(r)
         pretty_path = subtitle = r.path.replace(home, '~')
         app = subtitles.get('default')
         if app:
@@ -330,6 +848,8 @@ def do_search(repos, opts):
             type='file',
             icon='icon.png'
         )
+        it.setvar('query', opts.query)
+        it.setvar('repo_name', r.name)
         it.setvar('appkey', 'default')
 
         for key in apps:
@@ -344,6 +864,38 @@ def do_search(repos, opts):
     return 0
 
 
+def dispatch(argv):
+    """Parse simple command lines without docopt.
+
+    Args:
+        argv (list): Command-line arguments.
+
+    Returns:
+        dict: docopt-style arguments or ``None`` if ``argv`` must be
+            parsed by docopt.
+
+    """
+    if not argv or argv[0] not in COMMANDS:
+        return None
+
+    required, optional = COMMANDS[argv[0]]
+    values = argv[1:]
+    if not len(required) <= len(values) <= len(required) + len(optional):
+        return None
+
+    # Let docopt handle options and complain about bad ones
+    if [s for s in values if s.startswith('-')]:
+        return None
+
+    args = dict.fromkeys(COMMANDS, False)
+    for names in COMMANDS.values():
+        args.update(dict.fromkeys(names[0] + names[1]))
+
+    args[argv[0]] = True
+    args.update(zip(required + optional, values))
+    return args
+
+
 def parse_args():
     """Extract options from CLI arguments.
 
@@ -351,9 +903,10 @@ def parse_args():
         AttrDict: CLI options.
 
     """
-    from docopt import docopt
-
-    args = docopt(__doc__, wf.args)
+    args = dispatch(wf.args)
+    if args is None:
+        from docopt import docopt
+        args = docopt(__doc__, wf.args)
 
     log.debug('args=%r', args)
 
@@ -392,7 +945,7 @@ def main(wf):
         return do_settings()
 
     elif opts.do_update:
-        return do_update()
+        return do_update(queue=True)
 
     # Notify user if update is available
     # ------------------------------------------------------------------
@@ -415,22 +968,18 @@ def main(wf):
         wf.send_feedback()
         return 0
 
-    # Reload repos if settings file has been updated
-    if settings_updated():
-        log.info('settings were updated. Reloading repos...')
-        do_update()
-
-    repos = get_repos(opts)
+    start_watcher()
+    repos, updating, generation = get_repos(opts)
 
     # Show appropriate warning/info message if there are no repos to
     # show/search
     # ------------------------------------------------------------------
     if not repos:
-        if is_running('update'):
+        if updating:
             wf.add_item(u'Updating list of repos…',
-                        'Should be done in a few seconds',
+                        update_progress(),
                         icon=ICON_INFO)
-            wf.rerun = 0.5
+            wf.rerun = rerun_interval()
         else:
             wf.add_item('No git repos found',
                         'Check your settings with `reposettings`',
@@ -439,15 +988,16 @@ def main(wf):
         return 0
 
     # Reload results if `update` is running
-    if is_running('update'):
-        wf.rerun = 0.5
+    if updating:
+        wf.rerun = rerun_interval()
 
-    return do_search(repos, opts)
+    return do_search(repos, opts, generation)
 
 
 if __name__ == '__main__':
     wf = Workflow3(default_settings=DEFAULT_SETTINGS,
                    update_settings=UPDATE_SETTINGS,
-                   help_url=HELP_URL)
+                   help_url=HELP_URL,
+                   buffered_logging=True)
     log = wf.logger
     sys.exit(wf.run(main))
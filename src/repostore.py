@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Memory-mapped binary store for the list of repos.
+
+The store is a cache serializer registered with ``workflow.manager``
+as ``repostore``. Instead of unpickling every repo on every keystroke,
+the search script maps the cache file into memory and only decodes the
+records it actually scores or shows.
+
+File layout (all integers are little-endian unsigned 32-bit)::
+
+    magic     4 bytes  "RPS4"
+    count     number of records
+    fields    number of strings per record
+    masks     position of character masks relative to magic
+    text      position of text index relative to magic
+    index     position of field index relative to magic
+    typos     position of typo tree relative to magic
+    offsets   count * fields + 1 offsets into blob
+    blob      UTF-8 strings, back to back
+    masks     count * 2 character masks (see `char_mask`) of each
+              record's name and search key
+    text      (count + 1) * 2 offsets into text entries of names and
+              search keys, followed by the entries (see `text_entry`)
+    index     marshalled field index
+    typos     marshalled `typos.BKTree` of words in search keys
+
+String ``j`` of record ``i`` is ``blob[offsets[k]:offsets[k + 1]]``
+where ``k = i * fields + j``. Each record contains the fields of
+`Repo`, followed by the search fields:
+
+    key       name folded to ASCII, or empty if that is the same as name
+    search    the fields other than the name that searches match (see
+              `search_key`), so they can be scored in one pass
+
+The character masks and text index let a search skip records that
+can't match a query without decoding them: a key can only match if it
+contains every character of the query, and (unless the query has
+several words) only if it or its initials contain the query.
+
+The field index maps each of the `INDEXED` fields to a dict of its
+values and the numbers of the records with that value (as an array of
+integers). It is only loaded when a search is restricted by one of
+those fields. Similarly, the typo tree is only loaded when a search
+finds too few repos.
+"""
+
+from __future__ import print_function, absolute_import
+
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+from workflow import manager
+from workflow.workflow import INITIALS, isascii, split_on_delimiters
+
+from typos import BKTree
+
+Repo = namedtuple('Repo', 'name path root host owner branch status')
+# Only name and path are required
+Repo.__new__.__defaults__ = (u'', u'', u'', u'', u'')
+
+MAGIC = b'RPS4'
+HEADER = struct.Struct(b'<4sIIIIII')
+OFFSET = struct.Struct(b'<I')
+
+# Strings stored per repo and their positions in records
+FIELDS = Repo._fields + ('key', 'search')
+KEY = FIELDS.index('key')
+SEARCH = FIELDS.index('search')
+HOST = FIELDS.index('host')
+OWNER = FIELDS.index('owner')
+
+# Fields searches can be restricted by
+INDEXED = ('root', 'host', 'owner', 'branch', 'status')
+
+
+def fold_to_ascii(s):
+    """Fold ``s`` to ASCII like `Workflow.fold_to_ascii`."""
+    if isascii(s):
+        return s
+
+    from workflow import Workflow
+    return Workflow().fold_to_ascii(s)
+
+
+def repo_dirs(repo):
+    """Return directories between search root and ``repo``.
+
+    Args:
+        repo (Repo): Repo to return directories of.
+
+    Returns:
+        unicode: Space-separated directory names, including the repo's
+            own directory.
+
+    """
+    path = repo.path
+    if repo.root:
+        path = os.path.relpath(path, repo.root)
+
+    return u' '.join(s for s in path.split(u'/') if s and s != u'.')
+
+
+def search_key(repo):
+    """Return string searched for ``repo`` besides its name.
+
+    The directories between the search root and the repo come first,
+    then the remote's owner and host, so matches at the start of the
+    key (i.e. on directories) score best.
+
+    Args:
+        repo (Repo): Repo to return search key of.
+
+    Returns:
+        unicode: Space-separated directories, owner and host.
+
+    """
+    return u' '.join(s for s in (repo_dirs(repo), repo.owner, repo.host)
+                     if s)
+
+
+def char_mask(s):
+    """Return bit mask of the characters in ``s``.
+
+    Characters are lowercased and, if that changes them, also folded
+    to ASCII, so the mask of a key contains the mask of any query
+    `Workflow.filter` matches it against. Different characters may
+    have the same bit.
+
+    Args:
+        s (unicode): String to return mask of.
+
+    Returns:
+        int: Mask with bit ``ord(c) % 32`` set for each character.
+
+    """
+    chars = set(s.lower())
+    if not isascii(s):
+        chars.update(fold_to_ascii(s).lower())
+
+    mask = 0
+    for c in chars:
+        mask |= 1 << (ord(c) % 32)
+
+    return mask
+
+
+def text_entry(key):
+    """Return text index entry of search key ``key``.
+
+    The entry contains everything `Workflow.filter` matches a one-word
+    query against (except all characters in order, which never scores
+    enough for a search): the key and the initials of its capitals and
+    of its words, folded to ASCII, lowercased and newline-terminated.
+
+    Args:
+        key (unicode): Name or search key.
+
+    Returns:
+        str: UTF-8 encoded entry.
+
+    """
+    key = fold_to_ascii(key).strip()
+    capitals = u''.join(c for c in key if c in INITIALS)
+    words = u''.join(s[0] for s in split_on_delimiters(key) if s)
+    return u'{0}\n{1}\n{2}\n'.format(key, capitals, words).lower().encode(
+        'utf-8')
+
+
+def query_mask(query):
+    """Return mask of characters a key must contain to match ``query``."""
+    return char_mask(u''.join(query.lower().split()))
+
+
+def field_matches(s, value):
+    """Return ``True`` if field value ``s`` contains ``value``.
+
+    The comparison is case-insensitive.
+    """
+    return value.lower() in s.lower()
+
+
+class RepoStore(object):
+    """Read-only sequence of `Repo` tuples backed by a mapped file.
+
+    Args:
+        buf (mmap.mmap): Buffer containing store.
+        base (int): Position of store in ``buf``.
+
+    """
+
+    def __init__(self, buf, base=0):
+        """Create new `RepoStore`."""
+        (magic, count, fields, masks, text, index,
+         typos) = HEADER.unpack_from(buf, base)
+        if magic != MAGIC:
+            raise ValueError('not a repo store')
+
+        self._buf = buf
+        self._count = count
+        self._fields = fields
+        self._masks_pos = base + masks
+        self._masks = None
+        self._text_pos = base + text
+        self._text = base + text + (count + 1) * 2 * OFFSET.size
+        self._starts = None
+        self._index_pos = base + index
+        self._index = None
+        self._typos_pos = base + typos
+        self._typos = None
+        self._offsets = base + HEADER.size
+        self._blob = self._offsets + (count * fields + 1) * OFFSET.size
+
+    def __len__(self):
+        """Number of repos in store."""
+        return self._count
+
+    def __getitem__(self, i):
+        """Return `Repo` at index ``i``."""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('repo index out of range')
+
+        return Repo(*[self._string(i, j) for j in xrange(len(Repo._fields))])
+
+    def __iter__(self):
+        """Iterate over all repos."""
+        for i in xrange(self._count):
+            yield self[i]
+
+    def name(self, i):
+        """Return name of repo ``i``."""
+        return self._string(i, 0)
+
+    def path(self, i):
+        """Return path of repo ``i``."""
+        return self._string(i, 1)
+
+    def key(self, i):
+        """Return search key (name folded to ASCII) of repo ``i``."""
+        return self._string(i, KEY) or self._string(i, 0)
+
+    def search(self, i):
+        """Return search key (directories, owner and host) of repo ``i``."""
+        return self._string(i, SEARCH)
+
+    def host(self, i):
+        """Return remote host of repo ``i``."""
+        return self._string(i, HOST)
+
+    def owner(self, i):
+        """Return remote owner of repo ``i``."""
+        return self._string(i, OWNER)
+
+    def prefilter(self, query, ids, search=False, fold=True):
+        """Return those of ``ids`` whose keys may match ``query``.
+
+        Args:
+            query (unicode): Search query.
+            ids (iterable): Indices of repos.
+            search (bool, optional): Check search keys (see
+                `search_key`) instead of names.
+            fold (bool, optional): Whether keys are folded to ASCII
+                when they are matched against an ASCII ``query``.
+
+        Returns:
+            list: Indices of repos whose name or search key contains
+                all characters in ``query`` or, if ``query`` is one
+                ASCII word and ``fold`` is ``True``, whose text index
+                entry contains it.
+
+        """
+        j = 1 if search else 0
+        words = query.lower().split()
+        if fold and len(words) == 1 and isascii(words[0]):
+            found = self._find(words[0].encode('utf-8'), j)
+            return [i for i in ids if i in found]
+
+        if self._masks is None:
+            self._masks = self._array(self._masks_pos, self._count * 2)
+
+        mask = query_mask(query)
+        masks = self._masks
+        return [i for i in ids if masks[2 * i + j] & mask == mask]
+
+    def _find(self, word, j):
+        """Return indices of records whose text entry ``j`` contains ``word``.
+
+        Entries are searched in the mapped file, and only matching
+        entries are looked up in the offsets.
+        """
+        if self._starts is None:
+            n = self._count + 1
+            starts = self._array(self._text_pos, n * 2)
+            self._starts = (starts[:n], starts[n:])
+
+        starts = self._starts[j]
+        buf = self._buf
+        base = self._text
+        pos = base + starts[0]
+        end = base + starts[-1]
+        found = set()
+        while True:
+            k = buf.find(word, pos, end)
+            if k < 0:
+                return found
+
+            i = bisect_right(starts, k - base) - 1
+            found.add(i)
+            pos = base + starts[i + 1]
+
+    def _array(self, pos, count):
+        """Return ``count`` integers at ``pos`` as an array."""
+        a = array(b'I')
+        a.fromstring(self._buf[pos:pos + count * OFFSET.size])
+        if sys.byteorder == 'big':  # pragma: no cover
+            a.byteswap()
+        return a
+
+    def lookup(self, field, value):
+        """Return numbers of repos whose ``field`` contains ``value``.
+
+        Args:
+            field (str): One of `INDEXED`.
+            value (unicode): Value to look for.
+
+        Returns:
+            set: Indices of matching repos.
+
+        """
+        if self._index is None:
+            self._index = marshal.loads(
+                self._buf[self._index_pos:self._typos_pos])
+
+        ids = set()
+        for s, data in self._index[field].items():
+            if field_matches(s, value):
+                ids.update(array(b'I', data))
+
+        return ids
+
+    def similar(self, word, maxdist):
+        """Return repos with a word in their name similar to ``word``.
+
+        Args:
+            word (unicode): Lowercase ASCII word.
+            maxdist (int): Maximum edit distance.
+
+        Returns:
+            dict: Indices of matching repos mapped to edit distance.
+
+        """
+        if self._typos is None:
+            self._typos = BKTree.load(
+                marshal.loads(self._buf[self._typos_pos:]))
+
+        return self._typos.search(word, maxdist)
+
+    def _string(self, i, field):
+        """Decode string ``field`` of record ``i``."""
+        pos = self._offsets + (i * self._fields + field) * OFFSET.size
+        start, end = struct.unpack_from(b'<II', self._buf, pos)
+        return self._buf[self._blob + start:self._blob + end].decode('utf-8')
+
+
+class RepoList(list):
+    """In-memory list of `Repo` tuples with the `RepoStore` interface."""
+
+    def name(self, i):
+        """Return name of repo ``i``."""
+        return self[i].name
+
+    def path(self, i):
+        """Return path of repo ``i``."""
+        return self[i].path
+
+    def key(self, i):
+        """Return search key (name folded to ASCII) of repo ``i``."""
+        return fold_to_ascii(self[i].name)
+
+    def search(self, i):
+        """Return search key (directories, owner and host) of repo ``i``."""
+        return search_key(self[i])
+
+    def host(self, i):
+        """Return remote host of repo ``i``."""
+        return self[i].host
+
+    def owner(self, i):
+        """Return remote owner of repo ``i``."""
+        return self[i].owner
+
+    def prefilter(self, query, ids, search=False, fold=True):
+        """Return those of ``ids`` whose keys may match ``query``."""
+        key = self.search if search else self.name
+        mask = query_mask(query)
+        return [i for i in ids if char_mask(key(i)) & mask == mask]
+
+    def lookup(self, field, value):
+        """Return numbers of repos whose ``field`` contains ``value``."""
+        return {i for i, r in enumerate(self)
+                if field_matches(getattr(r, field), value)}
+
+
+class RepoStoreSerializer(object):
+    """Serialize a sequence of `Repo` tuples to a `RepoStore` file."""
+
+    @classmethod
+    def load(cls, file_obj):
+        """Map store in ``file_obj`` into memory.
+
+        Args:
+            file_obj (file): Open file positioned at start of store.
+
+        Returns:
+            RepoStore: Sequence of repos.
+
+        """
+        base = file_obj.tell()
+        buf = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        return RepoStore(buf, base)
+
+    @classmethod
+    def dump(cls, repos, file_obj):
+        """Write ``repos`` to ``file_obj``.
+
+        Args:
+            repos (list): Sequence of `Repo` tuples.
+            file_obj (file): File open for writing.
+
+        """
+        offsets = [0]
+        strings = []
+        size = 0
+        index = {field: {} for field in INDEXED}
+        keys = []
+        masks = []
+        texts = ([], [])
+        for i, r in enumerate(repos):
+            key = u'' if isascii(r.name) else fold_to_ascii(r.name)
+            keys.append(key or r.name)
+            search = search_key(r)
+            masks.extend((char_mask(r.name), char_mask(search)))
+            texts[0].append(text_entry(r.name))
+            texts[1].append(text_entry(search))
+            for s in r + (key, search):
+                s = s.encode('utf-8')
+                strings.append(s)
+                size += len(s)
+                offsets.append(size)
+
+            for field, values in index.items():
+                values.setdefault(getattr(r, field), array(b'I')).append(i)
+
+        for values in index.values():
+            for k, ids in values.items():
+                values[k] = ids.tostring()
+
+        masks = struct.pack(b'<%dI' % len(masks), *masks)
+
+        starts = [0]
+        for entry in texts[0] + texts[1]:
+            starts.append(starts[-1] + len(entry))
+        # Search keys' offsets start where names' end
+        starts.insert(len(repos) + 1, starts[len(repos)])
+        text = (struct.pack(b'<%dI' % len(starts), *starts) +
+                b''.join(texts[0]) + b''.join(texts[1]))
+
+        index = marshal.dumps(index, 2)
+        typos = marshal.dumps(BKTree.build(keys).dump(), 2)
+
+        pos = HEADER.size + len(offsets) * OFFSET.size + size
+        sections = [pos]
+        for data in (masks, text, index):
+            sections.append(sections[-1] + len(data))
+
+        file_obj.write(HEADER.pack(MAGIC, len(repos), len(FIELDS),
+                                   *sections))
+        file_obj.write(struct.pack(b'<%dI' % len(offsets), *offsets))
+        file_obj.write(b''.join(strings))
+        file_obj.write(masks)
+        file_obj.write(text)
+        file_obj.write(index)
+        file_obj.write(typos)
+
+
+manager.register('repostore', RepoStoreSerializer)
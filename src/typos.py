@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Find repos whose names contain words similar to a misspelt query.
+
+The words ("atoms") in repo names are stored in a BK-tree, a tree in
+which each child is keyed by its edit distance from its parent. By the
+triangle inequality, only children whose key is within the maximum
+distance of the query's distance from their parent can contain a
+match, so most of the tree is never visited.
+
+Edit distance is the Damerau-Levenshtein distance, i.e. the
+Levenshtein distance plus transpositions of adjacent characters, so
+``alfrde`` is 1 away from ``alfred``. Unlike the cheaper optimal string
+alignment distance, it allows edits between transposed characters,
+which it needs to satisfy the triangle inequality.
+
+The tree is built by `update.py` and stored in the `repostore` file.
+"""
+
+from __future__ import print_function, absolute_import
+
+from array import array
+import re
+
+# Words in names: lowercase runs, CamelCase words, acronyms and numbers
+split_words = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+').findall
+
+# Shorter words are neither indexed nor looked up
+MIN_LENGTH = 4
+
+
+def atoms(name):
+    """Return set of lowercase words in ``name`` worth indexing.
+
+    Args:
+        name (unicode): ASCII repo name.
+
+    Returns:
+        set: Words of at least `MIN_LENGTH` characters.
+
+    """
+    return {s.lower() for s in split_words(name) if len(s) >= MIN_LENGTH}
+
+
+def max_distance(word):
+    """Return edit distance tolerated for ``word``."""
+    return 1 if len(word) < 8 else 2
+
+
+def distance(a, b):
+    """Return Damerau-Levenshtein distance between ``a`` and ``b``.
+
+    Args:
+        a (unicode): First string.
+        b (unicode): Second string.
+
+    Returns:
+        int: Number of insertions, deletions, substitutions and
+            transpositions needed to turn ``a`` into ``b``.
+
+    """
+    if a == b:
+        return 0
+
+    # Row i + 1 and column j + 1 of `d` hold the distances between
+    # the first i characters of `a` and first j characters of `b`.
+    # Row and column 0 are a sentinel.
+    inf = len(a) + len(b)
+    d = [[inf] * (len(b) + 2)]
+    d.extend([inf, i] + [0] * len(b) for i in range(len(a) + 1))
+    d[1][1:] = range(len(b) + 1)
+
+    # Last row in which each character of `a` occurred
+    last = {}
+    for i, ca in enumerate(a, 1):
+        # Last column in this row in which `a` and `b` matched
+        match = 0
+        for j, cb in enumerate(b, 1):
+            # Transpose `cb` with `ca`, editing the characters between
+            # them
+            row = last.get(cb, 0)
+            col = match
+            if ca == cb:
+                cost = 0
+                match = j
+            else:
+                cost = 1
+
+            d[i + 1][j + 1] = min(d[i][j] + cost,
+                                  d[i + 1][j] + 1,
+                                  d[i][j + 1] + 1,
+                                  d[row][col] + (i - row - 1) + 1 +
+                                  (j - col - 1))
+
+        last[ca] = i
+
+    return d[-1][-1]
+
+
+class BKTree(object):
+    """BK-tree of words and the repos they occur in.
+
+    Node 0 is the root. ``words[n]`` is the word of node ``n``,
+    ``children[n]`` maps distances to child nodes and ``repos[n]``
+    holds the numbers of the repos containing the word (an array of
+    integers as a string).
+
+    Args:
+        words (list): Word of each node.
+        children (list): Children of each node.
+        repos (list): Repos of each node.
+
+    """
+
+    def __init__(self, words=None, children=None, repos=None):
+        """Create new `BKTree`."""
+        self.words = words or []
+        self.children = children or []
+        self.repos = repos or []
+
+    @classmethod
+    def build(cls, names):
+        """Build tree from repo names.
+
+        Args:
+            names (iterable): ASCII name of each repo.
+
+        Returns:
+            BKTree: Tree of words in ``names``.
+
+        """
+        postings = {}
+        for i, name in enumerate(names):
+            for word in atoms(name):
+                postings.setdefault(word, array(b'I')).append(i)
+
+        tree = cls()
+        # Insertion order doesn't affect correctness; sorting makes
+        # the tree reproducible
+        for word in sorted(postings):
+            tree._insert(word, postings[word].tostring())
+
+        return tree
+
+    def search(self, word, maxdist):
+        """Return repos containing a word within ``maxdist`` of ``word``.
+
+        Args:
+            word (unicode): Lowercase word to look for.
+            maxdist (int): Maximum edit distance.
+
+        Returns:
+            dict: Numbers of matching repos mapped to the smallest
+                distance of their words from ``word``.
+
+        """
+        found = {}
+        if not self.words:
+            return found
+
+        nodes = [0]
+        while nodes:
+            n = nodes.pop()
+            d = distance(word, self.words[n])
+            if d <= maxdist:
+                for i in array(b'I', self.repos[n]):
+                    if d < found.get(i, maxdist + 1):
+                        found[i] = d
+
+            for k, child in self.children[n].items():
+                if d - maxdist <= k <= d + maxdist:
+                    nodes.append(child)
+
+        return found
+
+    def dump(self):
+        """Return tree as a tuple that `marshal` can serialize."""
+        return self.words, self.children, self.repos
+
+    @classmethod
+    def load(cls, data):
+        """Create tree from the output of `dump`."""
+        return cls(*data)
+
+    def _insert(self, word, repos):
+        """Add ``word`` occurring in ``repos`` to tree."""
+        n = len(self.words)
+        self.words.append(word)
+        self.children.append({})
+        self.repos.append(repos)
+        if n == 0:
+            return
+
+        node = 0
+        while True:
+            d = distance(word, self.words[node])
+            child = self.children[node].get(d)
+            if child is None:
+                self.children[node][d] = n
+                return
+            node = child
@@ -10,21 +10,33 @@
 """Update the cache of git repositories.
 
 Uses settings from the workflow's `settings.json` file.
+
+Run as `update.py watch` to keep the cache up to date by watching the
+search directories for repos being added or removed.
 """
 
 from __future__ import print_function, unicode_literals
 
 import sys
 import os
+import re
 import subprocess
 from fnmatch import fnmatch
-from time import time
+from threading import Timer
+from time import sleep, time
+from multiprocessing import TimeoutError
 from multiprocessing.dummy import Pool
 
 from workflow import Workflow3
-from workflow.util import utf8ify
+from workflow.background import set_status
+from workflow.util import LockFile, utf8ify
 
-from repos import Repo
+from journal import Journal, diff
+from repos import (BACKEND_SQLITE, CATALOGUE_NAME, REPOS_SCHEMA,
+                   UPDATE_DEADLINE, settings_hash)
+from repostore import Repo
+from usage import Usage
+from watcher import get_backend
 
 # How many search threads to run at the same time
 CONCURRENT_SEARCHES = 4
@@ -34,12 +46,263 @@ CONCURRENT_SEARCHES = 4
 # 2 = also look in subdirectories of specified directory
 DEFAULT_DEPTH = 2
 
+# How long `find` may search a directory before it's abandoned.
+# Can be set per directory with the `timeout` option.
+DEFAULT_SCAN_TIMEOUT = 120  # seconds
+
+# How long `git status` may take
+STATUS_TIMEOUT = 10  # seconds
+
+# How many `git status` commands to run at the same time
+CONCURRENT_STATUSES = 4
+
+# How long to wait for all directories to be searched and repos'
+# statuses checked. Repos found by then are saved (without the
+# statuses not checked yet), so this must be shorter than the job's
+# deadline.
+SCAN_DEADLINE = UPDATE_DEADLINE - 60  # seconds
+
+# How long `update.py watch` runs before exiting. `repos.py` starts
+# it again the next time it's run.
+WATCH_LIFETIME = 86400  # seconds
+
+# How often the watcher checks whether the settings have changed
+WATCH_CHECK = 60  # seconds
+
+# How long to wait for more changes after a directory changes, so a
+# clone is handled once, not for every file it creates
+WATCH_DELAY = 2  # seconds
+
+# Host and owner in remote URLs like `git@github.com:deanishe/x.git`,
+# `https://github.com/deanishe/x` or `ssh://git@host:22/deanishe/x`
+REMOTE_URL = re.compile(r'''
+    ^(?:[a-z+]+://)?          # scheme
+    (?:[^@/]+@)?              # user
+    (?P<host>[^:/]+)          # host
+    (?::\d+)?[:/]             # port and separator
+    (?:~?(?P<owner>[^/]+)/)?  # owner
+    (?:[^/]+/)*[^/]+?/?$      # subgroups and repo
+''', re.VERBOSE)
+
 # Will be populated later
 log = None
 decode = None
 
 
-def find_git_repos(dirpath, excludes, depth, uid, gids, name_for_parent=1):
+def check_output(cmd, timeout, **kwargs):
+    """Run ``cmd`` and return its output.
+
+    Like `subprocess.check_output`, but ``cmd`` is killed if it
+    doesn't finish within ``timeout`` seconds.
+
+    Args:
+        cmd (list): Command and arguments.
+        timeout (float): Seconds to wait for command.
+        **kwargs: Passed to `subprocess.Popen`.
+
+    Returns:
+        str: Output of command or ``None`` if it timed out.
+
+    Raises:
+        subprocess.CalledProcessError: Raised if command fails.
+
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, **kwargs)
+    killed = []
+
+    def _kill():
+        """Kill command and record that it timed out."""
+        # Command may finish while the timer is firing
+        if proc.poll() is not None:
+            return
+        try:
+            proc.kill()
+        except OSError:  # already exited
+            return
+        killed.append(True)
+
+    timer = Timer(timeout, _kill)
+    timer.start()
+    try:
+        output = proc.communicate()[0]
+    finally:
+        timer.cancel()
+
+    if killed:
+        return None
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output)
+
+    return output
+
+
+def git_dirs(path):
+    """Return repo's git directory and common git directory.
+
+    These are both ``.git`` except for worktrees and submodules,
+    whose ``.git`` is a file pointing to the actual git directory.
+    Worktrees share the common directory (and thus the config) of
+    the main repo.
+
+    Args:
+        path (unicode): Path to repo.
+
+    Returns:
+        tuple: ``(gitdir, commondir)``.
+
+    """
+    gitdir = os.path.join(path, '.git')
+    if not os.path.isfile(gitdir):
+        return gitdir, gitdir
+
+    try:
+        with open(gitdir) as fp:
+            gitdir = os.path.join(path, fp.read().split(':', 1)[1].strip())
+
+        with open(os.path.join(gitdir, 'commondir')) as fp:
+            return gitdir, os.path.join(gitdir, fp.read().strip())
+    except (IOError, IndexError):
+        return gitdir, gitdir
+
+
+def git_config(path):
+    """Return contents of repo's config file.
+
+    Args:
+        path (unicode): Path to repo.
+
+    Returns:
+        unicode: Contents of ``.git/config`` or an empty string.
+
+    """
+    try:
+        with open(os.path.join(git_dirs(path)[1], 'config')) as fp:
+            return decode(fp.read())
+    except IOError:
+        return u''
+
+
+def git_branch(path):
+    """Return repo's current branch.
+
+    Args:
+        path (unicode): Path to repo.
+
+    Returns:
+        unicode: Name of branch or an empty string if HEAD is detached.
+
+    """
+    try:
+        with open(os.path.join(git_dirs(path)[0], 'HEAD')) as fp:
+            head = decode(fp.read()).strip()
+    except IOError:
+        return u''
+
+    prefix = 'ref: refs/heads/'
+    if head.startswith(prefix):
+        return head[len(prefix):]
+
+    return u''
+
+
+def git_status(path):
+    """Return whether repo has uncommitted changes.
+
+    Args:
+        path (unicode): Path to repo.
+
+    Returns:
+        unicode: ``dirty``, ``clean`` or an empty string if the status
+            couldn't be determined.
+
+    """
+    # Don't refresh the index: that takes `.git/index.lock`, which makes
+    # the user's own git commands fail while the update is running
+    cmd = ['git', '--no-optional-locks', 'status', '--porcelain',
+           '--ignore-submodules']
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = check_output(cmd, STATUS_TIMEOUT, cwd=utf8ify(path),
+                                  stderr=devnull)
+    except (OSError, subprocess.CalledProcessError) as err:
+        log.warning('could not get status of %s: %s', path, err)
+        return u''
+
+    if output is None:
+        log.warning('`git status` timed out in %s', path)
+        return u''
+
+    return u'dirty' if output.strip() else u'clean'
+
+
+def remote_info(path):
+    """Return host and owner of repo's ``origin`` remote.
+
+    Args:
+        path (unicode): Path to repo.
+
+    Returns:
+        tuple: ``(host, owner)``. Empty strings if repo has no remote.
+
+    """
+    url = None
+    section = None
+    for line in git_config(path).split('\n'):
+        line = line.strip()
+        if line.startswith('['):
+            section = line
+        elif section == '[remote "origin"]' and line.startswith('url'):
+            url = line.split('=', 1)[-1].strip()
+            break
+
+    m = REMOTE_URL.match(url or '')
+    if not m:
+        return '', ''
+
+    return m.group('host'), m.group('owner') or ''
+
+
+def excluded(filepath, excludes):
+    """Return ``True`` if ``filepath`` matches a pattern in ``excludes``."""
+    return any(fnmatch(filepath, pattern) for pattern in excludes)
+
+
+def make_repo(filepath, root, name_for_parent=1, check_status=False):
+    """Return `Repo` for repo at ``filepath``.
+
+    Args:
+        filepath (unicode): Path to repo.
+        root (unicode): Search directory repo was found in.
+        name_for_parent (int, optional): Which level of the directory
+            hierarchy to name the repo after.
+        check_status (bool, optional): Whether to run `git status`.
+
+    Returns:
+        Repo: Repo.
+
+    """
+    # Work out name for repo
+    if name_for_parent < 2:  # ignore 0, it's pointless
+        name = os.path.basename(filepath)
+    else:
+        components = filepath.rstrip('/').split('/')
+        if name_for_parent >= len(components):
+            log.warning('%s : `name_for_parent` is %d, but '
+                        'only %d levels in file tree',
+                        filepath, name_for_parent, len(components))
+            name = os.path.basename(filepath)
+        else:
+            name = components[-(name_for_parent)]
+
+    host, owner = remote_info(filepath)
+    status = git_status(filepath) if check_status else u''
+    return Repo(name, filepath, root, host, owner, git_branch(filepath),
+                status)
+
+
+def find_git_repos(dirpath, excludes, depth, uid, gids, name_for_parent=1,
+                   timeout=DEFAULT_SCAN_TIMEOUT):
     """Return list of directories containing a `.git` file or directory.
 
     Results matching globbing patterns in `excludes` will be ignored.
@@ -50,6 +313,11 @@ def find_git_repos(dirpath, excludes, depth, uid, gids, name_for_parent=1):
     `name_for_parent` is which level of the directory hierarchy to name
     the repo after relative to `.git` (1=immediate parent, 2=grandparent)
 
+    Repos' status (dirty or clean) is not determined (see `add_status`).
+
+    If `find` takes longer than `timeout` seconds, it is killed and no
+    repos are returned for `dirpath`.
+
     """
 
     def _group(args, primary, operator=None):
@@ -88,39 +356,25 @@ def find_git_repos(dirpath, excludes, depth, uid, gids, name_for_parent=1):
     cmd += ['-name', '.git', '-print']
     cmd = [utf8ify(s) for s in cmd]
     try:
-        output = subprocess.check_output(cmd)
+        output = check_output(cmd, timeout)
     except Exception as err:
         log.exception('failed: %r', err)
         raise err
 
+    if output is None:
+        log.error(u'search of `%s` timed out after %ds. Abandoned.',
+                  dirpath, timeout)
+        return []
+
     output = [os.path.dirname(s.strip()) for s in decode(output).split('\n')
               if s.strip()]
 
     results = []
     for filepath in output:
-        ignore = False
-        for pattern in excludes:
-            if fnmatch(filepath, pattern):
-                ignore = True
-                break
-
-        if ignore:
+        if excluded(filepath, excludes):
             continue
 
-        # Work out name for repo
-        if name_for_parent < 2:  # ignore 0, it's pointless
-            name = os.path.basename(filepath)
-        else:
-            components = filepath.rstrip('/').split('/')
-            if name_for_parent >= len(components):
-                log.warning('%s : `name_for_parent` is %d, but '
-                            'only %d levels in file tree',
-                            filepath, name_for_parent, len(components))
-                name = os.path.basename(filepath)
-            else:
-                name = components[-(name_for_parent)]
-
-        results.append(Repo(name, filepath))
+        results.append(make_repo(filepath, dirpath, name_for_parent))
 
     log.debug('%d repo(s) found in `%s` in %0.2fs', len(results), dirpath,
               time() - start)
@@ -131,6 +385,174 @@ def find_git_repos(dirpath, excludes, depth, uid, gids, name_for_parent=1):
     return results
 
 
+def add_status(repos, deadline):
+    """Return ``repos`` with their status (dirty or clean).
+
+    `git status` is run in up to `CONCURRENT_STATUSES` repos at the
+    same time. Repos whose status isn't known by ``deadline`` are
+    returned with an empty status.
+
+    Args:
+        repos (list): `Repo` tuples.
+        deadline (float): Time by which to stop waiting for statuses.
+
+    Returns:
+        list: `Repo` tuples.
+
+    """
+    set_status('update', 'checking status', 0, len(repos))
+    pool = Pool(CONCURRENT_STATUSES)
+    results = [pool.apply_async(git_status, (r.path,)) for r in repos]
+    pool.close()
+
+    checked = []
+    missing = 0
+    for i, (repo, r) in enumerate(zip(repos, results), 1):
+        try:
+            repo = repo._replace(status=r.get(max(deadline - time(), 0)))
+        except TimeoutError:
+            missing += 1
+        checked.append(repo)
+        if i % 100 == 0 or i == len(repos):
+            set_status('update', done=i)
+
+    # Running commands are killed by their own timeouts
+    pool.terminate()
+    if missing:
+        log.error('status of %d repo(s) not checked by deadline', missing)
+
+    return checked
+
+
+def walk_dirs(dirpath, depth, excludes):
+    """Yield directories that may contain a repo within ``depth``.
+
+    Like the `find` command in `find_git_repos`, excluded directories
+    and the contents of ``.git`` directories are skipped.
+
+    Args:
+        dirpath (unicode): Directory to search.
+        depth (int): Maximum depth of ``.git`` relative to ``dirpath``.
+        excludes (list): Globbing patterns of names to skip.
+
+    Yields:
+        tuple: ``(path, level)`` of ``dirpath`` (level 0) and its
+            subdirectories down to level ``depth - 1``.
+
+    """
+    stack = [(dirpath, 0)]
+    while stack:
+        path, level = stack.pop()
+        yield path, level
+        if level + 1 >= depth:
+            continue
+
+        try:
+            names = os.listdir(path)
+        except OSError:  # deleted or unreadable
+            continue
+
+        for name in names:
+            if name == '.git' or excluded(name, excludes):
+                continue
+
+            child = os.path.join(path, name)
+            if os.path.isdir(child):
+                stack.append((child, level + 1))
+
+
+def load_repos(wf):
+    """Return repos saved by the last update.
+
+    Args:
+        wf (Workflow3): Workflow object.
+
+    Returns:
+        list: `Repo` tuples or ``None`` if there are no (compatible)
+            saved repos.
+
+    """
+    if wf.settings.get('backend') == BACKEND_SQLITE:
+        from catalogue import Catalogue
+        cat = Catalogue(wf.cachefile(CATALOGUE_NAME))
+        header = cat.header()
+        if header and header.schema == REPOS_SCHEMA:
+            return list(cat)
+        return None
+
+    header = wf.cached_data_header('repos', 'repostore')
+    if header and header.schema == REPOS_SCHEMA:
+        return list(wf.cached_data('repos', max_age=0,
+                                   serializer='repostore') or ())
+    return None
+
+
+def save_repos(wf, repos, previous):
+    """Save ``repos`` and journal the changes from ``previous``.
+
+    Args:
+        wf (Workflow3): Workflow object.
+        repos (list): `Repo` tuples to save.
+        previous (list): `Repo` tuples returned by `load_repos`.
+
+    Returns:
+        list: Events added to journal or ``None`` if it was reset.
+
+    """
+    source = settings_hash(wf.settings)
+    if wf.settings.get('backend') == BACKEND_SQLITE:
+        from catalogue import Catalogue
+        Catalogue(wf.cachefile(CATALOGUE_NAME)).update(repos, REPOS_SCHEMA,
+                                                       source, time())
+    else:
+        wf.cache_data('repos', repos, serializer='repostore',
+                      schema=REPOS_SCHEMA, source=source)
+
+    journal = Journal(wf.cachedir)
+    if previous is None:
+        events = None
+        generation = journal.reset()
+    else:
+        events = diff(previous, repos)
+        generation = journal.append(events)
+
+    log.info('repos generation %d (%d change(s))', generation,
+             len(events or ()))
+    return events
+
+
+def update_repos(wf, update):
+    """Apply ``update`` to the saved repos and save the result.
+
+    The full update and the watcher both change the saved repos, so
+    each holds an exclusive lock from loading the repos to saving
+    them and journalling the changes. Otherwise, one could save repos
+    over newer ones saved by the other.
+
+    Args:
+        wf (Workflow3): Workflow object.
+        update (callable): Called with the saved repos (as returned by
+            `load_repos`) while the lock is held. Returns the new
+            `Repo` tuples or ``None`` to leave the saved repos as they
+            are.
+
+    Returns:
+        list: Events added to journal or ``None`` if it was reset or
+            nothing was saved.
+
+    """
+    with LockFile(wf.cachefile('repos')):
+        # Repos may have been saved by another process since this one
+        # last looked
+        wf.state.invalidate()
+        previous = load_repos(wf)
+        repos = update(previous)
+        if repos is None:
+            return None
+
+        return save_repos(wf, repos, previous)
+
+
 def main(wf):
     """Run script."""
     start = time()
@@ -145,34 +567,60 @@ def main(wf):
     uid = os.getuid()
     gids = os.getgroups()
     global_excludes = wf.settings.get('global_exclude_patterns', [])
+    check_status = wf.settings.get('index_status', False)
 
     repos = []
     results = []  # For AsyncResults objects returned by `apply_async`
     pool = Pool(CONCURRENT_SEARCHES)
 
+    # Report number of directories scanned
+    done = [0]
+    total = len([d for d in search_dirs
+                 if os.path.exists(os.path.expanduser(d['path']))])
+    set_status('update', 'scanning', 0, total)
+
+    def progress(_):
+        """Called when a directory has been scanned."""
+        done[0] += 1
+        set_status('update', done=done[0])
+
     for data in search_dirs:
         dirpath = os.path.expanduser(data['path'])
         depth = data.get('depth', DEFAULT_DEPTH)
         excludes = data.get('excludes', []) + global_excludes
         name_for_parent = data.get('name_for_parent', 1)
+        timeout = data.get('timeout', DEFAULT_SCAN_TIMEOUT)
 
         if not os.path.exists(dirpath):
             log.error(u'directory does not exist: %s', dirpath)
             continue
 
         r = pool.apply_async(find_git_repos,
-                             (dirpath, excludes, depth, uid, gids, name_for_parent))
-        results.append(r)
-
-    # Close the pool and wait for it to finish
+                             (dirpath, excludes, depth, uid, gids,
+                              name_for_parent, timeout),
+                             callback=progress)
+        results.append((dirpath, r))
+
+    # Close the pool and wait for the searches to finish. Searches
+    # hung despite their timeouts (e.g. on a dead network mount) are
+    # abandoned at the deadline.
     pool.close()
-    pool.join()
+    deadline = start + SCAN_DEADLINE
+    for dirpath, r in results:
+        try:
+            repos += r.get(max(deadline - time(), 0))
+        except TimeoutError:
+            log.error(u'search of `%s` did not finish. Abandoned.', dirpath)
 
-    # Retrieve results
-    for r in results:
-        repos += r.get()
+    pool.terminate()
+
+    if check_status:
+        repos = add_status(repos, deadline)
 
-    wf.cache_data('repos', repos)
+    set_status('update', 'saving')
+    update_repos(wf, lambda previous: repos)
+
+    Usage(wf.datadir).compact()
 
     log.info('%d repo(s) found in %0.2fs', len(repos), time() - start)
     log.info('update finished')
@@ -181,8 +629,109 @@ def main(wf):
     return 0
 
 
+def watch(wf):
+    """Update repos when repos are added to or removed from search dirs.
+
+    Watches the search directories down to their configured depth and
+    rescans directories that change. Exits when the settings change or
+    after `WATCH_LIFETIME`.
+    """
+    start = time()
+    backend = get_backend(wf.settings.get('watch_backend'))
+    settings_mtime = os.path.getmtime(wf.settings_path)
+    global_excludes = wf.settings.get('global_exclude_patterns', [])
+    check_status = wf.settings.get('index_status', False)
+
+    # Directories being watched -> (search dir options, level)
+    watched = {}
+
+    def _watch(dirpath, options, level):
+        """Watch ``dirpath`` and its subdirectories."""
+        depth = options['depth'] - level
+        for path, n in walk_dirs(dirpath, depth, options['excludes']):
+            if backend.add(path):
+                watched[path] = (options, level + n)
+
+    def _rescan(previous, tops):
+        """Return ``previous`` repos with directories ``tops`` rescanned.
+
+        Returns ``None`` if nothing changed.
+        """
+        if previous is None:  # wait for full update
+            return None
+
+        known = {r.path: r for r in previous}
+        repos = [r for r in previous
+                 if not any(r.path == p or r.path.startswith(p + '/')
+                            for p in tops)]
+
+        for top in tops:
+            options, level = watched[top]
+            for path in [p for p in watched
+                         if p == top or p.startswith(top + '/')]:
+                backend.remove(path)
+                del watched[path]
+
+            if not os.path.isdir(top):
+                continue
+
+            _watch(top, options, level)
+            for path, n in walk_dirs(top, options['depth'] - level,
+                                     options['excludes']):
+                if (not os.path.exists(os.path.join(path, '.git')) or
+                        excluded(path, options['excludes'])):
+                    continue
+
+                repo = known.get(path)
+                if repo is None:
+                    repo = make_repo(path, options['root'],
+                                     options['name_for_parent'],
+                                     check_status)
+                repos.append(repo)
+
+        if not diff(previous, repos):
+            return None
+
+        log.info('rescanned %d changed directories', len(tops))
+        return repos
+
+    for data in wf.settings.get('search_dirs', []):
+        dirpath = os.path.expanduser(data['path'])
+        options = dict(root=dirpath,
+                       depth=data.get('depth', DEFAULT_DEPTH),
+                       excludes=data.get('excludes', []) + global_excludes,
+                       name_for_parent=data.get('name_for_parent', 1))
+        _watch(dirpath, options, 0)
+
+    log.info('watching %d directories with %s backend', len(watched),
+             backend.name)
+
+    while time() - start < WATCH_LIFETIME:
+        changed = backend.wait(WATCH_CHECK)
+        if os.path.getmtime(wf.settings_path) != settings_mtime:
+            log.info('settings changed, stopping watcher')
+            break
+
+        if not changed:
+            continue
+
+        sleep(WATCH_DELAY)
+        changed |= backend.wait(0)
+
+        # Rescan topmost changed directories
+        changed = sorted(changed & set(watched))
+        tops = [p for i, p in enumerate(changed)
+                if not any(p.startswith(q + '/') for q in changed[:i])]
+
+        update_repos(wf, lambda previous: _rescan(previous, tops))
+        [h.flush() for h in log.handlers]
+
+    backend.close()
+    return 0
+
+
 if __name__ == '__main__':
     wf = Workflow3()
     log = wf.logger
     decode = wf.decode
-    sys.exit(wf.run(main))
+    sys.exit(wf.run(watch if wf.args[:1] == ['watch'] else main))
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Record which repos are opened and score them by frecency.
+
+Each repo has a score that is incremented when it's opened and
+decays exponentially with a half-life of `HALF_LIFE`.
+
+`repos.py open` appends ``(hash, time)`` records to a log, which is
+cheap and safe to do from concurrent processes. `update.py` regularly
+compacts the log into a table with a fixed number of slots, keyed by
+a hash of the repo's path, and drops repos whose score has decayed to
+nothing. Reading a score means looking up one slot in the table and
+replaying the (short) log.
+
+Table layout: `SLOTS` records of (hash, score, time), where score is
+the repo's score at time. Empty slots have hash 0. Collisions are
+resolved by linear probing.
+"""
+
+from __future__ import print_function, absolute_import
+
+from collections import defaultdict
+from hashlib import md5
+import os
+import struct
+import time
+
+from workflow.util import atomic_writer
+
+# Filenames of table and log in data directory
+TABLE_NAME = 'usage.table'
+LOG_NAME = 'usage.log'
+
+# Number of slots in table and number of repos kept in it
+SLOTS = 2048
+MAX_REPOS = SLOTS * 3 // 4
+
+# Score halves every 14 days
+HALF_LIFE = 14 * 86400
+
+# Repos with a lower score are removed when compacting
+MIN_SCORE = 0.01
+
+SLOT = struct.Struct(b'<Qdd')
+EVENT = struct.Struct(b'<Qd')
+
+
+def path_hash(path):
+    """Return 64-bit hash of ``path``. Never 0."""
+    if isinstance(path, unicode):
+        path = path.encode('utf-8')
+
+    return struct.unpack(b'<Q', md5(path).digest()[:8])[0] or 1
+
+
+def decay(score, age):
+    """Return ``score`` after ``age`` seconds."""
+    return score * 0.5 ** (max(age, 0) / float(HALF_LIFE))
+
+
+class Usage(object):
+    """Usage counts of repos.
+
+    Args:
+        dirpath (str): Directory to store usage data in.
+
+    """
+
+    def __init__(self, dirpath):
+        """Create new `Usage`."""
+        self.table_path = os.path.join(dirpath, TABLE_NAME)
+        self.log_path = os.path.join(dirpath, LOG_NAME)
+        self._table = None
+        self._events = None
+
+    def record(self, path, when=None):
+        """Record that repo at ``path`` was opened.
+
+        Args:
+            path (unicode): Path of repo.
+            when (float, optional): Time repo was opened.
+                Defaults to now.
+
+        """
+        when = time.time() if when is None else when
+        with open(self.log_path, 'ab') as fp:
+            fp.write(EVENT.pack(path_hash(path), when))
+
+        self._events = None
+
+    def score(self, path, now=None):
+        """Return frecency of repo at ``path``.
+
+        Args:
+            path (unicode): Path of repo.
+            now (float, optional): Time to calculate score at.
+                Defaults to now.
+
+        Returns:
+            float: Score. 0 if repo has never been opened.
+
+        """
+        now = time.time() if now is None else now
+        h = path_hash(path)
+        score, last = self._lookup(h)
+        for when in self.events.get(h, ()):
+            score = decay(score, when - last) + 1
+            last = when
+
+        return decay(score, now - last)
+
+    @property
+    def table(self):
+        """Contents of table file."""
+        if self._table is None:
+            try:
+                with open(self.table_path, 'rb') as fp:
+                    self._table = fp.read()
+            except IOError:  # not created yet
+                self._table = b''
+
+            if len(self._table) != SLOTS * SLOT.size:
+                self._table = b''
+
+        return self._table
+
+    @property
+    def events(self):
+        """Mapping of hashes to times in log."""
+        if self._events is None:
+            self._events = self._read_log(self.log_path)
+        return self._events
+
+    def compact(self, now=None):
+        """Merge log into table.
+
+        Args:
+            now (float, optional): Time to calculate scores at.
+                Defaults to now.
+
+        """
+        now = time.time() if now is None else now
+        tmp = self.log_path + '.compact'
+        # An earlier compaction was interrupted. Merge its log first,
+        # as renaming the current log would replace it.
+        if os.path.exists(tmp):
+            self._merge(tmp, now)
+
+        # Move log out of the way, so opens recorded while
+        # compacting go to a new log
+        try:
+            os.rename(self.log_path, tmp)
+        except OSError:  # nothing logged
+            return
+
+        self._merge(tmp, now)
+
+    def _merge(self, path, now):
+        """Merge log at ``path`` into table and delete it."""
+        scores = {}
+        table = self.table
+        for i in xrange(len(table) // SLOT.size):
+            h, score, last = SLOT.unpack_from(table, i * SLOT.size)
+            if h:
+                scores[h] = (score, last)
+
+        for h, times in self._read_log(path).items():
+            score, last = scores.get(h, (0.0, 0.0))
+            for when in times:
+                # Already merged by an interrupted compaction
+                if when <= last:
+                    continue
+                score = decay(score, when - last) + 1
+                last = when
+            scores[h] = (score, last)
+
+        # Keep the highest-scoring repos
+        current = sorted(((decay(s, now - t), h, s, t)
+                          for h, (s, t) in scores.items()), reverse=True)
+        current = [r for r in current[:MAX_REPOS] if r[0] >= MIN_SCORE]
+
+        slots = [None] * SLOTS
+        for _, h, score, last in current:
+            i = h % SLOTS
+            while slots[i] is not None:
+                i = (i + 1) % SLOTS
+            slots[i] = (h, score, last)
+
+        with atomic_writer(self.table_path, 'wb') as fp:
+            for slot in slots:
+                fp.write(SLOT.pack(*(slot or (0, 0.0, 0.0))))
+
+        os.unlink(path)
+        self._table = self._events = None
+
+    def _lookup(self, h):
+        """Return ``(score, time)`` for hash ``h`` from table."""
+        table = self.table
+        if not table:
+            return 0.0, 0.0
+
+        i = h % SLOTS
+        for _ in xrange(SLOTS):
+            key, score, last = SLOT.unpack_from(table, i * SLOT.size)
+            if key == h:
+                return score, last
+            if not key:
+                break
+            i = (i + 1) % SLOTS
+
+        return 0.0, 0.0
+
+    def _read_log(self, path):
+        """Return mapping of hashes to times of events in log."""
+        events = defaultdict(list)
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+        except IOError:  # nothing logged
+            return events
+
+        # Ignore partially-written record
+        for i in xrange(len(data) // EVENT.size):
+            h, when = EVENT.unpack_from(data, i * EVENT.size)
+            events[h].append(when)
+
+        for times in events.values():
+            times.sort()
+
+        return events
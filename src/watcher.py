@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Watch directories for entries being added or removed.
+
+Used by ``update.py watch`` to notice repos being cloned, moved or
+deleted between full updates.
+
+A backend watches a set of directories and reports which of them
+have changed. Backends are tried in the order of `BACKENDS`, and the
+first available one is used:
+
+    inotify   Linux's inotify API (via `ctypes`)
+    poll      compares the directories' modification times every
+              few seconds; works everywhere
+
+Additional backends (e.g. FSEvents) can be added to `BACKENDS`. They
+must implement the interface of `Backend`.
+"""
+
+from __future__ import print_function, absolute_import
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from workflow.util import utf8ify
+
+# How often `PollingBackend` checks directories
+POLL_INTERVAL = 5.0  # seconds
+
+
+class Backend(object):
+    """Interface of watcher backends."""
+
+    #: Name of backend (for settings and logging)
+    name = None
+
+    @classmethod
+    def available(cls):
+        """Return ``True`` if backend works on this system."""
+        raise NotImplementedError
+
+    def add(self, path):
+        """Start watching directory ``path``.
+
+        Args:
+            path (str): Directory to watch.
+
+        Returns:
+            bool: ``True`` if ``path`` is now being watched.
+
+        """
+        raise NotImplementedError
+
+    def remove(self, path):
+        """Stop watching directory ``path``."""
+        raise NotImplementedError
+
+    def wait(self, timeout):
+        """Wait for directories to change.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            set: Watched directories with added or removed entries
+                (empty if ``timeout`` expired). Directories that were
+                themselves deleted are included.
+
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release resources."""
+
+
+class PollingBackend(Backend):
+    """Check modification times of directories at an interval.
+
+    Adding or removing an entry updates a directory's modification
+    time, so ``interval`` seconds is the longest a change goes
+    unnoticed.
+
+    Args:
+        interval (float, optional): Seconds between checks.
+
+    """
+
+    name = 'poll'
+
+    def __init__(self, interval=POLL_INTERVAL):
+        """Create new `PollingBackend`."""
+        self.interval = interval
+        self._mtimes = {}
+
+    @classmethod
+    def available(cls):
+        """Polling works everywhere."""
+        return True
+
+    def add(self, path):
+        """Start watching directory ``path``."""
+        self._mtimes[path] = self._mtime(path)
+        return self._mtimes[path] is not None
+
+    def remove(self, path):
+        """Stop watching directory ``path``."""
+        self._mtimes.pop(path, None)
+
+    def wait(self, timeout):
+        """Check directories every `interval` seconds until one changes."""
+        end = time.time() + timeout
+        while True:
+            time.sleep(max(min(self.interval, end - time.time()), 0))
+            changed = set()
+            for path, mtime in self._mtimes.items():
+                current = self._mtime(path)
+                if current != mtime:
+                    self._mtimes[path] = current
+                    changed.add(path)
+
+            if changed or time.time() >= end:
+                return changed
+
+    def _mtime(self, path):
+        """Return modification time of ``path`` or ``None``."""
+        try:
+            return os.stat(path).st_mtime
+        except OSError:  # deleted
+            return None
+
+
+class InotifyBackend(Backend):
+    """Receive changes from the Linux kernel via inotify."""
+
+    name = 'inotify'
+
+    # From <sys/inotify.h>
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x01000000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+            IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    # Header of `struct inotify_event`: wd, mask, cookie, len
+    EVENT = struct.Struct(b'iIII')
+
+    _libc = None
+
+    def __init__(self):
+        """Create new `InotifyBackend`."""
+        libc = self.libc()
+        self._fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._paths = {}  # watch descriptor -> path
+        self._wds = {}  # path -> watch descriptor
+
+    @classmethod
+    def libc(cls):
+        """Return C library with the inotify functions or ``None``."""
+        if cls._libc is None:
+            cls._libc = False
+            if sys.platform.startswith('linux'):
+                libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                   use_errno=True)
+                if hasattr(libc, 'inotify_init1'):
+                    cls._libc = libc
+
+        return cls._libc or None
+
+    @classmethod
+    def available(cls):
+        """Return ``True`` on Linux."""
+        return cls.libc() is not None
+
+    def add(self, path):
+        """Start watching directory ``path``."""
+        if path in self._wds:
+            return True
+
+        wd = self.libc().inotify_add_watch(self._fd, utf8ify(path),
+                                           self.MASK)
+        if wd < 0:  # deleted or out of watches
+            return False
+
+        self._wds[path] = wd
+        self._paths[wd] = path
+        return True
+
+    def remove(self, path):
+        """Stop watching directory ``path``."""
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self.libc().inotify_rm_watch(self._fd, wd)
+
+    def wait(self, timeout):
+        """Wait for events from the kernel."""
+        try:
+            ready = select.select([self._fd], [], [], timeout)[0]
+        except select.error as err:
+            if err.args[0] != errno.EINTR:
+                raise
+            ready = []
+
+        if not ready:
+            return set()
+
+        data = os.read(self._fd, 65536)
+        changed = set()
+        i = 0
+        while i + self.EVENT.size <= len(data):
+            wd, mask, _, size = self.EVENT.unpack_from(data, i)
+            i += self.EVENT.size + size
+            if mask & self.IN_Q_OVERFLOW:  # events were lost
+                changed.update(self._paths.values())
+                continue
+
+            path = self._paths.get(wd)
+            if path is None:
+                continue
+
+            changed.add(path)
+            if mask & self.IN_IGNORED:  # watch removed by kernel
+                self._wds.pop(path, None)
+                self._paths.pop(wd, None)
+
+        return changed
+
+    def close(self):
+        """Close inotify file descriptor."""
+        os.close(self._fd)
+
+
+BACKENDS = [InotifyBackend, PollingBackend]
+
+
+def get_backend(name=None):
+    """Return an instance of backend ``name`` or the best available.
+
+    Args:
+        name (str, optional): Name of backend. If it's ``None`` or the
+            backend can't be used, the first one in `BACKENDS` that
+            can is used.
+
+    Returns:
+        Backend: Watcher backend.
+
+    """
+    backends = sorted(BACKENDS, key=lambda b: b.name != name)
+    for cls in backends:
+        if not cls.available():
+            continue
+        try:
+            return cls()
+        except OSError:  # e.g. too many inotify instances
+            continue
+
+    return PollingBackend()
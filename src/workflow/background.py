@@ -19,15 +19,26 @@ and examples.
 
 from __future__ import print_function, unicode_literals
 
+import errno
+import json
 import signal
 import sys
 import os
 import subprocess
 import pickle
+import time
 
 from workflow import Workflow
+from util import atomic_writer
 
-__all__ = ['is_running', 'run_in_background']
+__all__ = ['is_running', 'job_status', 'run_in_background', 'set_status']
+
+# Number of previous run durations used to estimate the next one
+HISTORY_SIZE = 10
+
+# Seconds after a job's deadline before its command is killed with
+# SIGKILL instead of SIGTERM
+KILL_GRACE = 10
 
 _wf = None
 
@@ -55,6 +66,57 @@ def _arg_cache(name):
     return wf().cachefile(name + '.argcache')
 
 
+def _pending_file(name):
+    """Return path to pickle file for arguments of a queued re-run.
+
+    :param name: name of task
+    :type name: ``unicode``
+    :returns: Path to pending file
+    :rtype: ``unicode`` filepath
+
+    """
+    return wf().cachefile(name + '.pending')
+
+
+def _status_file(name):
+    """Return path to JSON status file for ``name``.
+
+    :param name: name of task
+    :type name: ``unicode``
+    :returns: Path to status file
+    :rtype: ``unicode`` filepath
+
+    """
+    return wf().cachefile(name + '.status')
+
+
+def _history_file(name):
+    """Return path to JSON file of previous run durations of ``name``.
+
+    :param name: name of task
+    :type name: ``unicode``
+    :returns: Path to history file
+    :rtype: ``unicode`` filepath
+
+    """
+    return wf().cachefile(name + '.history')
+
+
+def _read_json(path, default=None):
+    """Load JSON file or return ``default`` if it can't be read."""
+    try:
+        with open(path, 'rb') as fp:
+            return json.load(fp)
+    except (IOError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    """Atomically write ``data`` to JSON file."""
+    with atomic_writer(path, 'wb') as fp:
+        json.dump(data, fp)
+
+
 def _pid_file(name):
     """Return path to PID file for ``name``.
 
@@ -83,6 +145,19 @@ def _process_exists(pid):
     return True
 
 
+def _read_pid(pidfile):
+    """Read PID from ``pidfile``.
+
+    Args:
+        pidfile (str): Path to PID file.
+
+    Returns:
+        int: PID in file.
+    """
+    with open(pidfile, 'rb') as fp:
+        return int(fp.read())
+
+
 def _job_pid(name):
     """Get PID of job or `None` if job does not exist.
 
@@ -93,16 +168,50 @@ def _job_pid(name):
         int: PID of job process (or `None` if job doesn't exist).
     """
     pidfile = _pid_file(name)
-    if not os.path.exists(pidfile):
+    state = wf().state
+    # Job may have started or exited since the file was last stat'ed
+    state.invalidate(pidfile)
+    try:
+        pid = state.get(pidfile, _read_pid)
+    except (IOError, ValueError):  # deleted or being written
+        state.invalidate(pidfile)
         return
 
-    with open(pidfile, 'rb') as fp:
-        pid = int(fp.read())
+    if pid is None:
+        return
+
+    if _process_exists(pid):
+        return pid
+
+    _delete(pidfile)
+    state.set(pidfile, None)
+
+
+def _delete(path):
+    """Delete file at ``path`` if it exists."""
+    try:
+        os.unlink(path)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
 
-        if _process_exists(pid):
-            return pid
 
-    os.unlink(pidfile)
+def _worker_pid(name):
+    """Return PID of the worker running job ``name`` or ``None``.
+
+    Jobs run by the background worker (see :mod:`workflow.worker`)
+    record the worker's PID in their status file. It never goes in
+    their PID file, as signalling the worker would stop all its jobs.
+
+    :param name: name of job
+    :type name: unicode
+    :returns: PID of worker or ``None``
+    :rtype: int
+
+    """
+    pid = _read_json(_status_file(name), {}).get('worker')
+    if pid is not None and _process_exists(pid):
+        return pid
 
 
 def is_running(name):
@@ -114,10 +223,42 @@ def is_running(name):
     :rtype: bool
 
     """
-    if _job_pid(name) is not None:
-        return True
+    pid = _job_pid(name)
+    if pid is None:
+        # Job may be waiting for its command to start in the worker
+        return _worker_pid(name) is not None
+
+    _check_deadline(name)
+    return True
+
+
+def _check_deadline(name):
+    """Terminate job ``name`` if it has overrun its deadline.
+
+    The job is sent SIGTERM, which its runner passes on to the
+    command. If the command is still running `KILL_GRACE` seconds
+    later, the next signal makes the runner kill it.
+
+    :param name: name of job
+    :type name: unicode
+
+    """
+    status = _read_json(_status_file(name), {})
+    # The worker enforces the deadlines of its jobs itself
+    if 'worker' in status:
+        return
+
+    deadline = status.get('deadline')
+    if deadline is None or time.time() < deadline:
+        return
 
-    return False
+    last = status.get('killed')
+    if last is None or time.time() - last > KILL_GRACE:
+        _log().error('[%s] job overran its deadline by %0.1fs, '
+                     'terminating it', name, time.time() - deadline)
+        status['killed'] = time.time()
+        _write_json(_status_file(name), status)
+        kill(name)
 
 
 def _background(pidfile, stdin='/dev/null', stdout='/dev/null',
@@ -162,6 +303,119 @@ def _background(pidfile, stdin='/dev/null', stdout='/dev/null',
 
     # Now I am a daemon!
     # Redirect standard file descriptors.
+    _redirect_streams(stdin, stdout, stderr)
+
+
+def durations(name):
+    """Return durations of previous runs of job ``name``.
+
+    .. versionadded:: 1.40
+
+    :param name: name of job
+    :type name: unicode
+    :returns: durations in seconds, oldest first
+    :rtype: list
+
+    """
+    return _read_json(_history_file(name), [])
+
+
+def expected_duration(name):
+    """Estimate duration of job ``name`` from previous runs.
+
+    .. versionadded:: 1.40
+
+    :param name: name of job
+    :type name: unicode
+    :returns: median duration of previous runs in seconds or ``None``
+        if the job hasn't run before
+    :rtype: float
+
+    """
+    history = sorted(durations(name))
+    if not history:
+        return None
+
+    return history[len(history) // 2]
+
+
+def set_status(name, phase=None, done=None, total=None):
+    """Report progress of job ``name``.
+
+    .. versionadded:: 1.40
+
+    Call this from the job's command. Arguments that are ``None``
+    keep their previous values.
+
+    :param name: name of job
+    :type name: unicode
+    :param phase: description of what the job is doing
+    :type phase: unicode
+    :param done: number of items processed
+    :type done: int
+    :param total: number of items to process
+    :type total: int
+
+    """
+    path = _status_file(name)
+    status = _read_json(path, {})
+    status.setdefault('started', time.time())
+    for key, value in (('phase', phase), ('done', done), ('total', total)):
+        if value is not None:
+            status[key] = value
+
+    _write_json(path, status)
+
+
+def job_status(name):
+    """Return progress of job ``name``.
+
+    .. versionadded:: 1.40
+
+    The returned dict has the keys ``phase``, ``done`` and ``total``
+    (as reported by the job with :func:`set_status`, or ``None``),
+    ``started`` (start time), ``elapsed`` (seconds since start),
+    ``eta`` (estimated seconds remaining or ``None`` if unknown) and
+    ``pending`` (whether a re-run is queued).
+
+    ``eta`` is extrapolated from ``done`` and ``total`` if the job
+    reports them, and otherwise based on previous run durations.
+
+    :param name: name of job
+    :type name: unicode
+    :returns: status or ``None`` if job isn't running
+    :rtype: dict
+
+    """
+    if not is_running(name):
+        return None
+
+    status = _read_json(_status_file(name), {})
+    now = time.time()
+    started = status.get('started', now)
+    elapsed = max(now - started, 0.0)
+    done, total = status.get('done'), status.get('total')
+
+    if done and total:
+        eta = elapsed * (total - done) / float(done)
+    else:
+        expected = status.get('expected')
+        eta = None if expected is None else max(expected - elapsed, 0.0)
+
+    return {
+        'phase': status.get('phase'),
+        'done': done,
+        'total': total,
+        'started': started,
+        'elapsed': elapsed,
+        'eta': eta,
+        'pending': os.path.exists(_pending_file(name)),
+    }
+
+
+def _redirect_streams(stdin='/dev/null', stdout='/dev/null',
+                      stderr='/dev/null'):  # pragma: no cover
+    """Redirect standard file descriptors of a daemon process."""
     si = open(stdin, 'r', 0)
     so = open(stdout, 'a+', 0)
     se = open(stderr, 'a+', 0)
@@ -173,11 +427,236 @@ def _background(pidfile, stdin='/dev/null', stdout='/dev/null',
         os.dup2(se.fileno(), sys.stderr.fileno())
 
 
+def _spawn(name, args, kwargs, deadline=None):  # pragma: no cover
+    """Double-fork from the current process and run job in grandchild.
+
+    .. versionadded:: 1.40
+
+    :param name: name of job
+    :type name: unicode
+    :param args: arguments passed as first argument to :func:`subprocess.call`
+    :param kwargs: keyword arguments to :func:`subprocess.call`
+    :param deadline: seconds the command may run for
+    :type deadline: float
+    :returns: ``0`` if job was started, else ``1``
+    :rtype: int
+
+    """
+    pidfile = _pid_file(name)
+    return _daemonize(name, pidfile, lambda: _run_job(name, args, kwargs,
+                                                      pidfile, deadline))
+
+
+def _daemonize(name, pidfile, target):  # pragma: no cover
+    """Double-fork from the current process and call ``target``.
+
+    .. versionadded:: 1.40
+
+    Returns as soon as the grandchild has been forked and its PID
+    written to ``pidfile``. The grandchild never returns: after
+    ``target`` returns, it exits with :func:`os._exit`, so the
+    parent's :mod:`atexit` handlers and buffered output aren't run or
+    written twice.
+
+    :param name: name of job (for logging)
+    :type name: unicode
+    :param pidfile: file to write PID of grandchild to
+    :type pidfile: filepath
+    :param target: function to call in grandchild
+    :type target: callable
+    :returns: ``0`` if grandchild was started, else ``1``
+    :rtype: int
+
+    """
+    pid = os.fork()
+    if pid > 0:
+        # First child exits as soon as the second fork is done
+        _, status = os.waitpid(pid, 0)
+        return 0 if status == 0 else 1
+
+    # First child
+    try:
+        os.chdir(wf().workflowdir)
+        os.setsid()
+        pid = os.fork()
+        if pid > 0:
+            tmp = pidfile + '.tmp'
+            with open(tmp, 'wb') as fp:
+                fp.write(str(pid))
+            os.rename(tmp, pidfile)
+            os._exit(0)
+    except Exception as err:
+        _log().critical('[%s] could not start job: %s', name, err)
+        _flush_log()
+        os._exit(1)
+
+    # Grandchild: the daemon
+    retcode = 1
+    try:
+        _redirect_streams()
+        _discard_log()
+        target()
+        retcode = 0
+    except Exception as err:
+        _log().exception('[%s] job failed: %s', name, err)
+    finally:
+        _flush_log()
+        os._exit(retcode)
+
+
+def _discard_log():  # pragma: no cover
+    """Drop log records buffered by the parent process."""
+    for handler in _log().handlers:
+        if hasattr(handler, 'discard'):
+            handler.discard()
+
+
+def _flush_log():  # pragma: no cover
+    """Write buffered log records."""
+    for handler in _log().handlers:
+        handler.flush()
+
+
+def _run_job(name, args, kwargs, pidfile, deadline=None,
+             run=None):  # pragma: no cover
+    """Run command of job ``name`` and delete its PID file.
+
+    Re-runs queued while the command is running are run (once) before
+    the PID file is deleted. ``run`` is called to run the command
+    (default: :func:`_run_command`).
+    """
+    log = _log()
+    run = run or _run_command
+    pending = _pending_file(name)
+    statusfile = _status_file(name)
+    # This run satisfies any earlier request
+    if os.path.exists(pending):
+        os.unlink(pending)
+
+    try:
+        while True:
+            run(name, args, kwargs, statusfile, deadline)
+
+            if not os.path.exists(pending):
+                break
+
+            with open(pending, 'rb') as fp:
+                data = pickle.load(fp)
+            os.unlink(pending)
+            args, kwargs = data['args'], data['kwargs']
+            deadline = data.get('deadline')
+            log.debug('[%s] running queued re-run', name)
+    finally:
+        # The worker deletes the PID file when a command exits
+        _delete(pidfile)
+
+    log.debug('[%s] job complete', name)
+
+
+def _command_started(name, statusfile, deadline=None, worker=None):
+    """Write status file of job ``name`` and return start time.
+
+    ``worker`` is the PID of the worker running the job, if any.
+    """
+    start = time.time()
+    status = {'started': start, 'expected': expected_duration(name)}
+    if deadline is not None:
+        status['deadline'] = start + deadline
+    if worker is not None:
+        status['worker'] = worker
+    _write_json(statusfile, status)
+    return start
+
+
+def _command_finished(name, statusfile, start, retcode, terminated=False):
+    """Log result of job ``name``, record its duration and tidy up."""
+    log = _log()
+    try:
+        if terminated:
+            log.error('[%s] command terminated after %0.1fs', name,
+                      time.time() - start)
+        elif retcode:
+            log.error('[%s] command failed with status %d', name, retcode)
+        elif retcode == 0:
+            history = durations(name) + [time.time() - start]
+            _write_json(_history_file(name), history[-HISTORY_SIZE:])
+    finally:
+        os.unlink(statusfile)
+
+
+def _popen(args, kwargs):
+    """Start command ``args`` in its own process group.
+
+    The group lets :func:`_signal_command` reach any processes the
+    command starts, e.g. the children of a shell.
+    """
+    kwargs = dict(kwargs)
+    kwargs.setdefault('preexec_fn', os.setsid)
+    return subprocess.Popen(args, **kwargs)
+
+
+def _signal_command(proc, sig):
+    """Send signal ``sig`` to command ``proc`` and its children.
+
+    Only ``proc`` is signalled if it isn't a process group leader
+    (the caller passed its own ``preexec_fn`` to :func:`_popen`).
+    """
+    try:
+        os.killpg(proc.pid, sig)
+        return
+    except OSError as err:
+        if err.errno not in (errno.ESRCH, errno.EPERM):
+            raise
+
+    try:
+        proc.send_signal(sig)
+    except OSError as err:  # already exited
+        if err.errno != errno.ESRCH:
+            raise
+
+
+def _run_command(name, args, kwargs, statusfile,
+                 deadline=None):  # pragma: no cover
+    """Run command of job ``name`` and record how long it took.
+
+    SIGTERM sent to this process (e.g. by :func:`kill`) terminates
+    the command and any processes it started. Further signals kill
+    them.
+    """
+    start = _command_started(name, statusfile, deadline)
+
+    # Run the command
+    _log().debug('[%s] running command: %r', name, args)
+    proc = _popen(args, kwargs)
+    signals = []
+
+    def handler(signum, frame):
+        """Pass SIGTERM on to command."""
+        signals.append(signum)
+        if len(signals) == 1:
+            _signal_command(proc, signal.SIGTERM)
+        else:
+            _signal_command(proc, signal.SIGKILL)
+
+    previous = signal.signal(signal.SIGTERM, handler)
+    retcode = None
+    try:
+        retcode = proc.wait()
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        _command_finished(name, statusfile, start, retcode, bool(signals))
+
+
 def kill(name, sig=signal.SIGTERM):
     """Send a signal to job ``name`` via :func:`os.kill`.
 
     .. versionadded:: 1.29
 
+    .. versionchanged:: 1.40
+        A job run by the background worker can only be signalled
+        while its command is running. The signal goes to the command,
+        not the worker.
+
     Args:
         name (str): Name of the job
         sig (int, optional): Signal to send (default: SIGTERM)
@@ -193,46 +672,119 @@ def kill(name, sig=signal.SIGTERM):
     return True
 
 
-def run_in_background(name, args, **kwargs):
-    r"""Cache arguments then call this script again via :func:`subprocess.call`.
+def run_in_background(name, args, runner=None, queue=False, deadline=None,
+                      every=None, **kwargs):
+    r"""Run command in a background process.
+
+    .. versionchanged:: 1.40
+        Fork from the calling process instead of calling
+        ``background.py``. Pass ``runner='script'`` to use
+        ``background.py`` or ``runner='worker'`` to use the
+        :mod:`~workflow.worker`. Added ``queue``, ``deadline`` and
+        ``every`` arguments.
 
     :param name: name of job
     :type name: unicode
     :param args: arguments passed as first argument to :func:`subprocess.call`
+    :param runner: ``fork``, ``script`` or ``worker``. Defaults to the
+        ``__workflow_background_runner`` setting or ``fork``
+    :type runner: unicode
+    :param queue: if job is already running, run it again when it's
+        finished
+    :type queue: bool
+    :param deadline: seconds the command may run for before
+        :func:`is_running` terminates it
+    :type deadline: float
+    :param every: with ``runner='worker'``, have the worker run the
+        job again every ``every`` seconds (ignored by other runners)
+    :type every: float
     :param \**kwargs: keyword arguments to :func:`subprocess.call`
-    :returns: exit code of sub-process
+    :returns: ``0`` if job was started, else non-zero
     :rtype: int
 
-    When you call this function, it caches its arguments and then calls
-    ``background.py`` in a subprocess. The Python subprocess will load the
-    cached arguments, fork into the background, and then run the command you
-    specified.
+    When you call this function, the current process double-forks, and
+    the grandchild, which is detached from Alfred, runs the command you
+    specified. No extra Python interpreter has to be started.
+
+    With ``runner='script'``, the arguments are cached, and
+    ``background.py`` is called in a subprocess. The Python subprocess
+    will load the cached arguments, fork into the background, and then
+    run the command.
 
-    This function will return as soon as the ``background.py`` subprocess has
-    forked, returning the exit code of *that* process (i.e. not of the command
-    you're trying to run).
+    Either way, this function will return as soon as the job's process
+    has been forked and its PID saved, returning the exit code of the
+    launcher (i.e. not of the command you're trying to run).
 
     If that process fails, an error will be written to the log file.
 
     If a process is already running under the same name, this function will
-    return immediately and will not run the specified command.
+    return immediately and will not run the specified command. With
+    ``queue=True``, the command will instead be run once more after the
+    current run has finished. Any number of calls while the job is
+    running result in a single re-run with the latest arguments.
+
+    While the job is running, :func:`job_status` returns its progress.
+
+    If the command runs for longer than ``deadline``, the next call to
+    :func:`is_running` (e.g. from a Script Filter) terminates it with
+    :func:`kill` and logs an error.
+
+    With ``runner='worker'``, the job is passed over a socket to a
+    resident :mod:`~workflow.worker` process (which is started if it
+    isn't running), and the worker runs the command in a thread.
 
     """
+    if runner is None:
+        runner = wf().settings.get('__workflow_background_runner', 'fork')
+
     if is_running(name):
-        _log().info('[%s] job already running', name)
+        if queue:
+            with atomic_writer(_pending_file(name), 'wb') as fp:
+                pickle.dump({'args': args, 'kwargs': kwargs,
+                             'deadline': deadline}, fp)
+            _log().info('[%s] job already running, queued re-run', name)
+        else:
+            _log().info('[%s] job already running', name)
         return
 
+    if runner == 'fork':
+        _log().debug('[%s] forking background job: %r', name, args)
+        retcode = _spawn(name, args, kwargs, deadline)
+        wf().state.invalidate(_pid_file(name))
+        if retcode:  # pragma: no cover
+            _log().error('[%s] could not fork background job', name)
+        else:
+            _log().debug('[%s] background job started', name)
+
+        return retcode
+
+    if runner == 'worker':
+        from worker import submit
+
+        _log().debug('[%s] passing job to background worker: %r', name, args)
+        retcode = submit(name, args, kwargs, queue, deadline, every)
+        wf().state.invalidate(_pid_file(name))
+        if retcode:  # pragma: no cover
+            _log().error('[%s] background worker did not accept job', name)
+        else:
+            _log().debug('[%s] background job started', name)
+
+        return retcode
+
     argcache = _arg_cache(name)
 
     # Cache arguments
     with open(argcache, 'wb') as fp:
-        pickle.dump({'args': args, 'kwargs': kwargs}, fp)
+        pickle.dump({'args': args, 'kwargs': kwargs, 'deadline': deadline},
+                    fp)
         _log().debug('[%s] command cached: %s', name, argcache)
 
     # Call this script
     cmd = ['/usr/bin/python', __file__, name]
     _log().debug('[%s] passing job to background runner: %r', name, cmd)
     retcode = subprocess.call(cmd)
+    # PID file has been written by the background runner
+    wf().state.invalidate(_pid_file(name))
 
     if retcode:  # pragma: no cover
         _log().error('[%s] background runner failed with %d', name, retcode)
@@ -272,18 +824,7 @@ def main(wf):  # pragma: no cover
     # Delete argument cache file
     os.unlink(argcache)
 
-    try:
-        # Run the command
-        log.debug('[%s] running command: %r', name, args)
-
-        retcode = subprocess.call(args, **kwargs)
-
-        if retcode:
-            log.error('[%s] command failed with status %d', name, retcode)
-    finally:
-        os.unlink(pidfile)
-
-    log.debug('[%s] job complete', name)
+    _run_job(name, args, kwargs, pidfile, data.get('deadline'))
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -23,6 +23,7 @@ import os
 import signal
 import subprocess
 import sys
+import threading
 from threading import Event
 import time
 
@@ -438,11 +439,14 @@ def appinfo(name):
 
 
 @contextmanager
-def atomic_writer(fpath, mode):
+def atomic_writer(fpath, mode, lock=None):
     """Atomic file writer.
 
     .. versionadded:: 1.12
 
+    .. versionchanged:: 1.40
+        Added ``lock`` argument.
+
     Context manager that ensures the file is only written if the write
     succeeds. The data is first written to a temporary file.
 
@@ -450,6 +454,9 @@ def atomic_writer(fpath, mode):
     :type fpath: ``unicode``
     :param mode: sames as for :func:`open`
     :type mode: string
+    :param lock: lock to hold while the temporary file is renamed,
+        e.g. one returned by :meth:`RWLock.write`. It isn't held while
+        the data are written.
 
     """
     suffix = '.{}.tmp'.format(os.getpid())
@@ -457,7 +464,11 @@ def atomic_writer(fpath, mode):
     with open(temppath, mode) as fp:
         try:
             yield fp
-            os.rename(temppath, fpath)
+            if lock is None:
+                os.rename(temppath, fpath)
+            else:
+                with lock:
+                    os.rename(temppath, fpath)
         finally:
             try:
                 os.remove(temppath)
@@ -470,6 +481,11 @@ class LockFile(object):
 
     .. versionadded:: 1.13
 
+    .. versionchanged:: 1.40
+        Waits for the lock in the kernel instead of checking every
+        ``delay`` seconds. Added ``shared`` argument. The lockfile is
+        no longer deleted on release.
+
     Creates a lockfile alongside ``protected_path``. Other ``LockFile``
     instances will refuse to lock the same path.
 
@@ -478,28 +494,42 @@ class LockFile(object):
     >>>     with open(path, 'wb') as fp:
     >>>         fp.write(data)
 
+    Any number of shared locks can be held at the same time, but not
+    while an exclusive lock is held. Use them for reading:
+
+    >>> with LockFile(path, shared=True):
+    >>>     with open(path, 'rb') as fp:
+    >>>         data = fp.read()
+
     Args:
         protected_path (unicode): File to protect with a lockfile
         timeout (float, optional): Raises an :class:`AcquisitionError`
             if lock cannot be acquired within this number of seconds.
             If ``timeout`` is 0 (the default), wait forever.
         delay (float, optional): How often to check (in seconds) if
-            lock has been released.
+            lock has been released. Only used when the lock can't be
+            waited for in the kernel (i.e. with a ``timeout`` outside
+            the main thread or while a timer is running).
+        shared (bool, optional): Acquire a shared (read) lock instead
+            of an exclusive one.
 
     Attributes:
         delay (float): How often to check (in seconds) whether the lock
             can be acquired.
         lockfile (unicode): Path of the lockfile.
+        shared (bool): Whether lock is shared.
         timeout (float): How long to wait to acquire the lock.
 
     """
 
-    def __init__(self, protected_path, timeout=0.0, delay=0.05):
+    def __init__(self, protected_path, timeout=0.0, delay=0.05,
+                 shared=False):
         """Create new :class:`LockFile` object."""
         self.lockfile = protected_path + '.lock'
         self._lockfile = None
         self.timeout = timeout
         self.delay = delay
+        self.shared = shared
         self._lock = Event()
         atexit.register(self.release)
 
@@ -514,48 +544,96 @@ class LockFile(object):
         If the lock is in use and ``blocking`` is ``False``, return
         ``False``.
 
-        Otherwise, check every :attr:`delay` seconds until it acquires
-        lock or exceeds attr:`timeout` and raises an :class:`AcquisitionError`.
+        Otherwise, wait until the lock is released or :attr:`timeout`
+        is exceeded and an :class:`AcquisitionError` is raised.
 
         """
         if self.locked and not blocking:
             return False
 
         start = time.time()
-        while True:
-            # Raise error if we've been waiting too long to acquire the lock
-            if self.timeout and (time.time() - start) >= self.timeout:
-                raise AcquisitionError('lock acquisition timed out')
+        # Locked by this instance in another thread
+        while self.locked:
+            self._check_timeout(start)
+            time.sleep(self.delay)
 
-            # If already locked, wait then try again
-            if self.locked:
-                time.sleep(self.delay)
-                continue
+        # Readable, so it can be share-locked. The lockfile is never
+        # deleted: a process waiting for the lock would end up
+        # holding a lock on a file nobody else can see.
+        if self._lockfile is None:
+            self._lockfile = open(self.lockfile, 'a+')
 
-            # Create in append mode so we don't lose any contents
-            if self._lockfile is None:
-                self._lockfile = open(self.lockfile, 'a')
+        op = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        if not self._try_lock(op):
+            if not blocking:
+                return False
 
-            # Try to acquire the lock
-            try:
-                fcntl.lockf(self._lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                self._lock.set()
-                break
-            except IOError as err:  # pragma: no cover
-                if err.errno not in (errno.EACCES, errno.EAGAIN):
-                    raise
+            self._wait(op, start)
 
-                # Don't try again
-                if not blocking:  # pragma: no cover
-                    return False
+        self._lock.set()
+        return True
 
-                # Wait, then try again
-                time.sleep(self.delay)
+    def _try_lock(self, op):
+        """Try to lock without waiting. Return ``True`` if locked."""
+        try:
+            fcntl.lockf(self._lockfile, op | fcntl.LOCK_NB)
+            return True
+        except IOError as err:
+            if err.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+            return False
 
-        return True
+    def _check_timeout(self, start):
+        """Raise :class:`AcquisitionError` if :attr:`timeout` is over."""
+        if self.timeout and time.time() - start >= self.timeout:
+            raise AcquisitionError('lock acquisition timed out')
+
+    def _wait(self, op, start):
+        """Wait until lock can be acquired.
+
+        Without a timeout, the kernel puts the process to sleep until
+        the lock is released. With a timeout, a SIGALRM interrupts the
+        wait if it takes too long. SIGALRM can only be used in the
+        main thread and if no other timer is set; otherwise, poll
+        with increasing intervals of up to :attr:`delay` seconds.
+
+        """
+        if not self.timeout:
+            fcntl.lockf(self._lockfile, op)
+            return
+
+        remaining = self.timeout - (time.time() - start)
+        if remaining <= 0:
+            raise AcquisitionError('lock acquisition timed out')
+
+        if (isinstance(threading.current_thread(), threading._MainThread) and
+                not signal.getitimer(signal.ITIMER_REAL)[0]):
+            def _timeout(signum, frame):
+                raise AcquisitionError('lock acquisition timed out')
+
+            previous = signal.signal(signal.SIGALRM, _timeout)
+            try:
+                signal.setitimer(signal.ITIMER_REAL, remaining)
+                fcntl.lockf(self._lockfile, op)
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            except AcquisitionError:
+                # The alarm may have gone off just after the lock was
+                # acquired
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                fcntl.lockf(self._lockfile, fcntl.LOCK_UN)
+                raise
+            finally:
+                signal.signal(signal.SIGALRM, previous)
+            return
+
+        interval = min(0.001, self.delay)
+        while not self._try_lock(op):
+            self._check_timeout(start)
+            time.sleep(interval)
+            interval = min(interval * 2, self.delay)
 
     def release(self):
-        """Release the lock by deleting `self.lockfile`."""
+        """Release the lock."""
         if not self._lock.is_set():
             return False
 
@@ -565,11 +643,8 @@ class LockFile(object):
             pass
         finally:
             self._lock.clear()
+            self._lockfile.close()
             self._lockfile = None
-            try:
-                os.unlink(self.lockfile)
-            except (IOError, OSError):  # pragma: no cover
-                pass
 
             return True
 
@@ -583,10 +658,58 @@ class LockFile(object):
         self.release()
 
     def __del__(self):
-        """Clear up `self.lockfile`."""
+        """Release lock."""
         self.release()  # pragma: no cover
 
 
+class RWLock(object):
+    """Shared-read/exclusive-write lock on a file that is replaced atomically.
+
+    .. versionadded:: 1.40
+
+    Any number of readers may hold the lock at the same time, so they
+    never wait for each other. Writers write to a temporary file and
+    only lock the file while they rename the temporary file over it
+    (see :func:`atomic_writer`), so readers only ever wait for a
+    rename.
+
+    Readers only need to hold the lock while they open the file (and
+    e.g. check its age): an open file keeps its contents when it is
+    replaced.
+
+    >>> lock = RWLock(path)
+    >>> with lock.read():
+    >>>     fp = open(path, 'rb')
+    >>> data = fp.read()
+    >>> with atomic_writer(path, 'wb', lock.write()) as fp:
+    >>>     fp.write(data)
+
+    Locks are held by the process, so a process must not acquire a
+    lock on a file while it holds another one on it: releasing either
+    releases both.
+
+    Args:
+        protected_path (unicode): File to protect.
+        timeout (float, optional): See :class:`LockFile`.
+        delay (float, optional): See :class:`LockFile`.
+
+    """
+
+    def __init__(self, protected_path, timeout=0.0, delay=0.05):
+        """Create new :class:`RWLock` object."""
+        self.protected_path = protected_path
+        self._read = LockFile(protected_path, timeout, delay, shared=True)
+        self._write = LockFile(protected_path, timeout, delay)
+
+    def read(self):
+        """Return shared :class:`LockFile` for reading."""
+        return self._read
+
+    def write(self):
+        """Return exclusive :class:`LockFile` for writing."""
+        return self._write
+
+
 class uninterruptible(object):
     """Decorator that postpones SIGTERM until wrapped function returns.
 
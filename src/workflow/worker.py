@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+#
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""A resident process that runs background jobs.
+
+.. versionadded:: 1.40
+
+Set ``__workflow_background_runner`` to ``worker`` in the workflow's
+settings to have :func:`~workflow.background.run_in_background` pass
+jobs to a long-lived worker instead of forking a new process for each
+one.
+
+The worker is started on demand. It listens on a Unix socket, runs
+job commands in a thread pool, re-runs jobs submitted with ``every``
+at that interval, and exits when it hasn't received a request for
+:data:`IDLE_TIMEOUT` seconds and no job is running.
+
+Requests and responses are single JSON objects, terminated by the
+client shutting down its side of the connection.
+
+Jobs run by the worker use the same PID, status, pending and history
+files as other background jobs, so :func:`~workflow.background.is_running`,
+:func:`~workflow.background.job_status` and
+:func:`~workflow.background.kill` work as usual. A job's PID file only
+exists while its command is running and holds the command's PID; the
+worker's PID is kept in the job's status file.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import json
+import os
+import pickle
+import signal
+import socket
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from background import (
+    KILL_GRACE,
+    _command_finished,
+    _command_started,
+    _daemonize,
+    _delete,
+    _flush_log,
+    _log,
+    _pending_file,
+    _pid_file,
+    _popen,
+    _run_job,
+    _signal_command,
+    _status_file,
+    _write_json,
+    wf,
+)
+from util import LockFile, atomic_writer, utf8ify
+
+__all__ = ['submit', 'stop']
+
+# Seconds without requests (and running jobs) after which the worker
+# exits
+IDLE_TIMEOUT = 3600
+
+# Number of jobs the worker runs at the same time
+THREADS = 4
+
+# How often (in seconds) the worker checks deadlines and schedules
+TICK = 1.0
+
+# Seconds a client waits for the worker to respond
+CLIENT_TIMEOUT = 5.0
+
+
+def socket_path():
+    """Return path of the worker's socket.
+
+    The socket is in the temporary directory, not the cache directory,
+    because socket paths may only be ~100 bytes long.
+
+    :returns: path to socket
+    :rtype: ``unicode`` filepath
+
+    """
+    key = hashlib.md5(wf().cachedir.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), 'aw-{0}.sock'.format(key))
+
+
+def _worker_pidfile():
+    """Return path to PID file of the worker."""
+    return wf().cachefile('__workflow_worker.pid')
+
+
+def _write_pid(pidfile, pid):
+    """Atomically write ``pid`` to ``pidfile``."""
+    with atomic_writer(pidfile, 'wb') as fp:
+        fp.write(str(pid))
+
+
+def _request(request):
+    """Send ``request`` to the worker and return its response.
+
+    :param request: request
+    :type request: dict
+    :returns: response
+    :rtype: dict
+    :raises socket.error: if the worker isn't running
+
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CLIENT_TIMEOUT)
+    try:
+        sock.connect(socket_path())
+        sock.sendall(json.dumps(request))
+        sock.shutdown(socket.SHUT_WR)
+        return json.loads(_read_all(sock))
+    finally:
+        sock.close()
+
+
+def _read_all(sock):
+    """Read from ``sock`` until the other side closes it."""
+    chunks = []
+    while True:
+        data = sock.recv(4096)
+        if not data:
+            return b''.join(chunks)
+        chunks.append(data)
+
+
+def _start_worker():  # pragma: no cover
+    """Bind the worker's socket and fork the worker.
+
+    The socket is bound before the fork, so clients can connect as
+    soon as this function returns.
+
+    :returns: ``0`` if the worker was started, else ``1``
+    :rtype: int
+
+    """
+    path = socket_path()
+    # Nobody is answering, so any existing socket is stale
+    if os.path.exists(path):
+        os.unlink(path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    sock.listen(16)
+
+    _log().debug('starting background worker: %s', path)
+    try:
+        return _daemonize('__workflow_worker', _worker_pidfile(),
+                          lambda: Worker(sock).serve())
+    finally:
+        sock.close()
+
+
+def submit(name, args, kwargs, queue=False, deadline=None, every=None):
+    """Pass job to the worker, starting the worker if necessary.
+
+    :param name: name of job
+    :type name: unicode
+    :param args: arguments passed as first argument to :func:`subprocess.call`
+    :param kwargs: keyword arguments to :func:`subprocess.call`
+    :param queue: if job is already running, run it again when it's
+        finished
+    :type queue: bool
+    :param deadline: seconds the command may run for
+    :type deadline: float
+    :param every: run job again every ``every`` seconds while the
+        worker is running
+    :type every: float
+    :returns: ``0`` if job was accepted, else non-zero
+    :rtype: int
+
+    """
+    request = {'action': 'run', 'name': name, 'args': args,
+               'kwargs': kwargs, 'queue': queue, 'deadline': deadline,
+               'every': every}
+    try:
+        return _request(request)['retcode']
+    except socket.error:
+        pass
+
+    # Only one client may start the worker
+    with LockFile(socket_path()):
+        try:
+            return _request(request)['retcode']
+        except socket.error:
+            pass
+
+        if _start_worker():
+            return 1
+
+    try:
+        return _request(request)['retcode']
+    except socket.error as err:  # pragma: no cover
+        _log().error('background worker not responding: %s', err)
+        return 1
+
+
+def stop():
+    """Tell the worker to exit once its running jobs are finished.
+
+    :returns: ``True`` if the worker was running, else ``False``
+    :rtype: bool
+
+    """
+    try:
+        _request({'action': 'stop'})
+    except socket.error:
+        return False
+    return True
+
+
+class Worker(object):
+    """Server that runs jobs in a thread pool.
+
+    :param sock: bound, listening socket
+    :type sock: :class:`socket.socket`
+    :param threads: number of jobs to run at the same time
+    :type threads: int
+    :param idle: seconds without requests after which to exit
+    :type idle: float
+
+    """
+
+    def __init__(self, sock, threads=THREADS, idle=IDLE_TIMEOUT):
+        """Create new :class:`Worker`."""
+        self.sock = sock
+        self.pool = ThreadPool(threads)
+        self.idle = idle
+        self.lock = threading.Lock()
+        # Names of jobs being run by a thread
+        self.active = set()
+        # Running commands: name -> [Popen, deadline, time terminated]
+        self.procs = {}
+        # Periodic jobs: name -> [job, interval, next run]
+        self.schedule = {}
+        # Jobs to pass to the thread pool
+        self.starting = []
+        self.last_request = time.time()
+        self.stopping = False
+
+    def serve(self):  # pragma: no cover
+        """Handle requests until idle or stopped."""
+        log = _log()
+        log.debug('background worker started')
+        self.sock.settimeout(TICK)
+        try:
+            while not self._done():
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.timeout:
+                    pass
+                else:
+                    self._handle(conn)
+
+                self._check_deadlines()
+                self._run_scheduled()
+                while self.starting:
+                    self.pool.apply_async(self._run, self.starting.pop(0))
+                _flush_log()
+        finally:
+            # Remove socket first, so clients start a new worker
+            # instead of connecting to this one
+            try:
+                os.unlink(socket_path())
+            except OSError:
+                pass
+            self.sock.close()
+            self.pool.close()
+            self.pool.join()
+            log.debug('background worker exited')
+
+    def _done(self):
+        """Return ``True`` if the worker should exit."""
+        with self.lock:
+            if self.active:
+                return False
+
+        return (self.stopping or
+                time.time() - self.last_request > self.idle)
+
+    def _handle(self, conn):  # pragma: no cover
+        """Answer request on connection ``conn``."""
+        self.last_request = time.time()
+        try:
+            conn.settimeout(CLIENT_TIMEOUT)
+            request = json.loads(_read_all(conn))
+            action = request.get('action')
+            if action == 'run':
+                response = {'retcode': self._submit(request)}
+            elif action == 'stop':
+                self.stopping = True
+                response = {'retcode': 0}
+            else:
+                response = {'retcode': 1,
+                            'error': 'unknown action: {0!r}'.format(action)}
+
+            conn.sendall(json.dumps(response))
+        except (socket.error, ValueError) as err:
+            _log().error('bad request to background worker: %s', err)
+        finally:
+            conn.close()
+
+    def _submit(self, request):
+        """Start job described by ``request`` unless it's running."""
+        name = request['name']
+        # JSON decodes to unicode, which `subprocess` can't handle
+        job = {'args': [utf8ify(s) for s in request['args']],
+               'kwargs': request.get('kwargs', {}),
+               'deadline': request.get('deadline')}
+        every = request.get('every')
+        if every:
+            self.schedule[name] = [job, every, time.time() + every]
+
+        if not self._start(name, job) and request.get('queue'):
+            with atomic_writer(_pending_file(name), 'wb') as fp:
+                pickle.dump(job, fp)
+            _log().info('[%s] job already running, queued re-run', name)
+
+        return 0
+
+    def _start(self, name, job):
+        """Run ``job`` in a thread unless it's already running.
+
+        :returns: ``True`` if job was started, else ``False``
+        :rtype: bool
+
+        """
+        with self.lock:
+            if name in self.active:
+                return False
+            self.active.add(name)
+
+        # Job is running until `_run` deletes the status file
+        _write_json(_status_file(name), {'worker': os.getpid()})
+        # Thread is started after the client has been answered, so
+        # it doesn't hold up the response
+        self.starting.append((name, job))
+        return True
+
+    def _run(self, name, job):  # pragma: no cover
+        """Run ``job`` and any re-runs queued while it's running."""
+        try:
+            _run_job(name, job['args'], job['kwargs'], _pid_file(name),
+                     job['deadline'], run=self._run_command)
+        except Exception as err:
+            _log().exception('[%s] job failed: %s', name, err)
+        finally:
+            _delete(_status_file(name))
+            with self.lock:
+                self.active.discard(name)
+            _flush_log()
+
+    def _run_command(self, name, args, kwargs, statusfile,
+                     deadline=None):  # pragma: no cover
+        """Run command of job ``name``.
+
+        Unlike :func:`~workflow.background._run_command`, this can't
+        use a signal handler (it runs in a thread), so the worker
+        enforces ``deadline`` itself.
+        """
+        start = _command_started(name, statusfile, deadline, os.getpid())
+        _log().debug('[%s] running command: %r', name, args)
+        retcode = proc = None
+        # Don't leak the worker's sockets to the command, or clients
+        # wait for it to exit
+        kwargs = dict(kwargs)
+        kwargs.setdefault('close_fds', True)
+        try:
+            proc = _popen(args, kwargs)
+            _write_pid(_pid_file(name), proc.pid)
+            with self.lock:
+                self.procs[name] = [
+                    proc, None if deadline is None else start + deadline,
+                    None]
+            retcode = proc.wait()
+        finally:
+            with self.lock:
+                _, _, terminated = self.procs.pop(name, (None, None, None))
+            _command_finished(name, statusfile, start, retcode,
+                              terminated is not None)
+            # Job is running until `_run` deletes the status file
+            _write_json(statusfile, {'worker': os.getpid()})
+            _delete(_pid_file(name))
+
+    def _check_deadlines(self):
+        """Terminate commands that have overrun their deadlines."""
+        now = time.time()
+        with self.lock:
+            for name, entry in self.procs.items():
+                proc, deadline, terminated = entry
+                if deadline is None or now < deadline:
+                    continue
+
+                if terminated is None:
+                    _log().error('[%s] job overran its deadline by '
+                                 '%0.1fs, terminating it', name,
+                                 now - deadline)
+                    _signal_command(proc, signal.SIGTERM)
+                    entry[2] = now
+                elif now - terminated > KILL_GRACE:
+                    _signal_command(proc, signal.SIGKILL)
+
+    def _run_scheduled(self):
+        """Start periodic jobs that are due."""
+        if self.stopping:
+            return
+
+        now = time.time()
+        for name, entry in self.schedule.items():
+            job, every, due = entry
+            if now >= due:
+                entry[2] = now + every
+                if self._start(name, job):
+                    _log().debug('[%s] running scheduled job', name)
@@ -21,18 +21,23 @@ up your Python script to best utilise the :class:`Workflow` object.
 
 from __future__ import print_function, unicode_literals
 
+import atexit
 import binascii
+from collections import namedtuple
+from contextlib import contextmanager
 import cPickle
 from copy import deepcopy
 import json
 import logging
 import logging.handlers
+import marshal
 import os
 import pickle
 import plistlib
 import re
 import shutil
 import string
+import struct
 import subprocess
 import sys
 import time
@@ -47,7 +52,7 @@ except ImportError:  # pragma: no cover
 from util import AcquisitionError  # noqa: F401
 from util import (
     atomic_writer,
-    LockFile,
+    RWLock,
     uninterruptible,
 )
 
@@ -445,6 +450,43 @@ MATCH_ALL = 127
 DEFAULT_UPDATE_FREQUENCY = 1
 
 
+####################################################################
+# Cache file headers
+####################################################################
+
+#: Marks cache files that start with a :class:`CacheHeader`
+CACHE_MAGIC = b'AWC1'
+
+# magic, schema, record count, creation time, source hash
+_cache_header = struct.Struct(b'<4siid32s')
+
+CacheHeader = namedtuple('CacheHeader', ['schema', 'count', 'created',
+                                         'source'])
+"""Metadata written at the start of cache files by :meth:`Workflow.cache_data`.
+
+Returned by :meth:`Workflow.cached_data_header`.
+
+.. py:attribute:: schema
+
+    Format version of the cached data (``int``) as passed to
+    :meth:`~Workflow.cache_data`.
+
+.. py:attribute:: count
+
+    Number of records in the cached data or ``None`` if it has no length.
+
+.. py:attribute:: created
+
+    Time the cache was written (Unix timestamp).
+
+.. py:attribute:: source
+
+    Hash of the data the cache was generated from (up to 32 ASCII
+    characters) or ``None``.
+
+"""
+
+
 ####################################################################
 # Keychain access errors
 ####################################################################
@@ -499,6 +541,32 @@ def isascii(text):
     return True
 
 
+def read_cache_header(file_obj):
+    """Read :class:`CacheHeader` from the start of a cache file.
+
+    .. versionadded:: 1.40
+
+    Afterwards, ``file_obj`` is positioned at the start of the serialized
+    data, so it can be passed straight to a serializer's ``load()``.
+
+    :param file_obj: cache file open for reading
+    :type file_obj: ``file`` object
+    :returns: :class:`CacheHeader` or ``None`` if the file has no header
+        (i.e. it was written by an older version)
+
+    """
+    data = file_obj.read(_cache_header.size)
+    if len(data) == _cache_header.size and data[:4] == CACHE_MAGIC:
+        _, schema, count, created, source = _cache_header.unpack(data)
+        if count < 0:
+            count = None
+        source = source.rstrip(b'\0').decode('ascii') or None
+        return CacheHeader(schema, count, created, source)
+
+    file_obj.seek(0)
+    return None
+
+
 ####################################################################
 # Implementation classes
 ####################################################################
@@ -699,11 +767,53 @@ class PickleSerializer(object):
         return pickle.dump(obj, file_obj, protocol=-1)
 
 
+class MarshalSerializer(object):
+    """Wrapper around :mod:`marshal`. Sets ``version``.
+
+    .. versionadded:: 1.40
+
+    The fastest serializer, but it only supports built-in types
+    (``dict``, ``list``, ``tuple``, strings, numbers etc.). Subclasses,
+    such as :func:`~collections.namedtuple` instances, cannot be
+    serialized. Files may not be readable by other versions of Python.
+
+    """
+
+    @classmethod
+    def load(cls, file_obj):
+        """Load serialized object from open marshal file.
+
+        .. versionadded:: 1.40
+
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+        :returns: object loaded from marshal file
+        :rtype: object
+
+        """
+        return marshal.load(file_obj)
+
+    @classmethod
+    def dump(cls, obj, file_obj):
+        """Serialize object ``obj`` to open marshal file.
+
+        .. versionadded:: 1.40
+
+        :param obj: Python object to serialize
+        :type obj: built-in types only
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+
+        """
+        return marshal.dump(obj, file_obj, 2)
+
+
 # Set up default manager and register built-in serializers
 manager = SerializerManager()
 manager.register('cpickle', CPickleSerializer)
 manager.register('pickle', PickleSerializer)
 manager.register('json', JSONSerializer)
+manager.register('marshal', MarshalSerializer)
 
 
 class Item(object):
@@ -799,6 +909,83 @@ class Item(object):
         return root
 
 
+class BufferedLogHandler(logging.Handler):
+    """Log handler that writes records to a rotating log file at exit.
+
+    .. versionadded:: 1.40
+
+    Records are held in memory until :meth:`flush` is called, which
+    happens when the :mod:`logging` module shuts down. The log file is
+    only opened if there is something to write, so a run that logs
+    nothing at or above the active level does no log I/O at all.
+
+    Arguments are the same as for
+    :class:`~logging.handlers.RotatingFileHandler`.
+
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0):
+        """Create new :class:`BufferedLogHandler` object."""
+        logging.Handler.__init__(self)
+        self.filename = filename
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.buffer = []
+        self._target = None
+
+    def emit(self, record):
+        """Add ``record`` to the buffer."""
+        self.buffer.append(record)
+
+    def flush(self):
+        """Write buffered records to the log file."""
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+
+            if self._target is None:
+                self._target = logging.handlers.RotatingFileHandler(
+                    self.filename,
+                    maxBytes=self.maxBytes,
+                    backupCount=self.backupCount)
+                self._target.setFormatter(self.formatter)
+
+            for record in self.buffer:
+                self._target.handle(record)
+
+            self._target.flush()
+            self.buffer = []
+        finally:
+            self.release()
+
+    def discard(self):
+        """Drop buffered records without writing them.
+
+        A forked process should call this, as its buffer holds copies
+        of the parent's records.
+
+        """
+        self.acquire()
+        try:
+            self.buffer = []
+        finally:
+            self.release()
+
+    def close(self):
+        """Write buffered records and close the log file."""
+        self.flush()
+        self.acquire()
+        try:
+            if self._target is not None:
+                self._target.close()
+                self._target = None
+        finally:
+            self.release()
+
+        logging.Handler.close(self)
+
+
 class Settings(dict):
     """A dictionary that saves itself when changed.
 
@@ -815,27 +1002,52 @@ class Settings(dict):
     An appropriate instance is provided by :class:`Workflow` instances at
     :attr:`Workflow.settings`.
 
+    .. versionchanged:: 1.40
+        Changes that leave the settings as they are on disk aren't
+        saved. Use :meth:`batch` to save several changes at once.
+        The settings file is protected by a :class:`~workflow.util.RWLock`,
+        so reading it doesn't block other readers.
+
     """
 
-    def __init__(self, filepath, defaults=None):
+    def __init__(self, filepath, defaults=None, state=None):
         """Create new :class:`Settings` object."""
         super(Settings, self).__init__()
         self._filepath = filepath
+        self._lock = RWLock(filepath, 0.5)
+        self._state = state
         self._nosave = False
+        self._batch = 0
         self._original = {}
-        if os.path.exists(self._filepath):
+        if state is not None:
+            exists = state.stat(self._filepath) is not None
+        else:
+            exists = os.path.exists(self._filepath)
+
+        if exists:
             self._load()
         elif defaults:
-            for key, val in defaults.items():
-                self[key] = val
-            self.save()  # save default settings
+            # Save default settings in one write
+            with self.batch():
+                for key, val in defaults.items():
+                    self[key] = val
+
+    def _read(self, filepath):
+        """Read settings from JSON file ``filepath``."""
+        data = {}
+        with self._lock.read():
+            fp = open(filepath, 'rb')
+        with fp:
+            data.update(json.load(fp))
+
+        return data
 
     def _load(self):
         """Load cached settings from JSON file `self._filepath`."""
-        data = {}
-        with LockFile(self._filepath, 0.5):
-            with open(self._filepath, 'rb') as fp:
-                data.update(json.load(fp))
+        if self._state is not None:
+            data = deepcopy(self._state.get(self._filepath, self._read))
+        else:
+            data = self._read(self._filepath)
 
         self._original = deepcopy(data)
 
@@ -851,23 +1063,49 @@ class Settings(dict):
         you probably are, ``self._filepath`` will be ``settings.json``
         in your workflow's data directory (see :attr:`~Workflow.datadir`).
         """
-        if self._nosave:
+        if self._nosave or self._batch:
             return
 
         data = {}
         data.update(self)
+        # Nothing has changed since settings were loaded or saved
+        if data == self._original:
+            return
 
-        with LockFile(self._filepath, 0.5):
-            with atomic_writer(self._filepath, 'wb') as fp:
-                json.dump(data, fp, sort_keys=True, indent=2,
-                          encoding='utf-8')
+        with atomic_writer(self._filepath, 'wb', self._lock.write()) as fp:
+            json.dump(data, fp, sort_keys=True, indent=2, encoding='utf-8')
+
+        self._original = deepcopy(data)
+        if self._state is not None:
+            self._state.set(self._filepath, deepcopy(data))
+
+    @contextmanager
+    def batch(self):
+        """Context manager that saves settings once, on exit.
+
+        .. versionadded:: 1.40
+
+        Changes made inside the ``with`` block are saved together
+        when it exits (if they change anything), instead of rewriting
+        the settings file for every change. Batches may be nested.
+
+        >>> with wf.settings.batch():
+        >>>     wf.settings['a'] = 1
+        >>>     del wf.settings['b']
+
+        """
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+            self.save()
 
     # dict methods
     def __setitem__(self, key, value):
         """Implement :class:`dict` interface."""
-        if self._original.get(key) != value:
-            super(Settings, self).__setitem__(key, value)
-            self.save()
+        super(Settings, self).__setitem__(key, value)
+        self.save()
 
     def __delitem__(self, key):
         """Implement :class:`dict` interface."""
@@ -886,6 +1124,204 @@ class Settings(dict):
         return ret
 
 
+class RunState(object):
+    """Snapshot of the small files a workflow reads on every run.
+
+    .. versionadded:: 1.40
+
+    A typical Script Filter run reads several small files (settings,
+    update status, PID files) only to find that nothing has changed.
+    :class:`RunState` keeps their parsed contents in a single
+    :mod:`marshal` file together with each source file's modification
+    time, size and inode, so a run costs one read plus one
+    :func:`os.stat` per source file.
+
+    Values are only reloaded from their source files if the source has
+    changed. Writers (e.g. :meth:`Settings.save`) update the snapshot
+    directly via :meth:`set` or :meth:`refresh`.
+
+    Values should be :mod:`marshal`-able, i.e. built-in types only.
+    Values that aren't are left out of the saved snapshot.
+
+    Use :meth:`for_path` to get the shared instance for a snapshot file,
+    or :attr:`Workflow.state` for the workflow's instance.
+
+    :param filepath: path to snapshot file
+    :type filepath: ``unicode``
+
+    """
+
+    #: Format version of snapshot files
+    version = 1
+
+    # Shared instances by filepath
+    _instances = {}
+
+    def __init__(self, filepath):
+        """Create new :class:`RunState` object."""
+        self.filepath = filepath
+        self._facts = None
+        self._stats = {}
+        self._dirty = False
+
+    @classmethod
+    def for_path(cls, filepath):
+        """Return shared :class:`RunState` for ``filepath``.
+
+        The snapshot is saved automatically when the process exits.
+
+        :param filepath: path to snapshot file
+        :type filepath: ``unicode``
+        :returns: :class:`RunState` instance
+
+        """
+        if filepath not in cls._instances:
+            state = cls(filepath)
+            atexit.register(state.save)
+            cls._instances[filepath] = state
+
+        return cls._instances[filepath]
+
+    @property
+    def facts(self):
+        """Mapping of source filepath to ``(signature, value)``."""
+        if self._facts is None:
+            self._facts = {}
+            try:
+                with open(self.filepath, 'rb') as fp:
+                    version, facts = marshal.load(fp)
+                if version == self.version:
+                    self._facts = facts
+            except (IOError, OSError, EOFError, ValueError, TypeError):
+                pass
+
+        return self._facts
+
+    def stat(self, path):
+        """Return signature of ``path`` or ``None`` if it doesn't exist.
+
+        Each path is only stat'ed once per run (or until it is written
+        via :meth:`set`, :meth:`refresh` or :meth:`invalidate`).
+
+        :param path: path to file
+        :type path: ``unicode``
+        :returns: ``(mtime, size, inode)`` tuple or ``None``
+
+        """
+        if path not in self._stats:
+            try:
+                st = os.stat(path)
+                self._stats[path] = (st.st_mtime, st.st_size, st.st_ino)
+            except OSError:
+                self._stats[path] = None
+
+        return self._stats[path]
+
+    def mtime(self, path):
+        """Return modification time of ``path`` or ``None``.
+
+        :param path: path to file
+        :type path: ``unicode``
+        :returns: modification time or ``None`` if ``path`` doesn't exist
+
+        """
+        sig = self.stat(path)
+        if sig is None:
+            return None
+
+        return sig[0]
+
+    def get(self, path, loader):
+        """Return value for ``path``, calling ``loader`` if it has changed.
+
+        :param path: path to source file
+        :type path: ``unicode``
+        :param loader: called with ``path`` to load the value if ``path``
+            has changed since it was last recorded
+        :type loader: ``callable``
+        :returns: value returned by ``loader`` or ``None`` if ``path``
+            doesn't exist
+
+        """
+        sig = self.stat(path)
+        fact = self.facts.get(path)
+        if fact is not None and fact[0] == sig:
+            return fact[1]
+
+        value = None
+        if sig is not None:
+            value = loader(path)
+
+        self.facts[path] = (sig, value)
+        self._dirty = True
+        return value
+
+    def set(self, path, value):
+        """Record ``value`` for ``path`` after ``path`` has been written.
+
+        :param path: path to source file
+        :type path: ``unicode``
+        :param value: value to record for ``path``
+
+        """
+        self.invalidate(path)
+        self.facts[path] = (self.stat(path), value)
+        self._dirty = True
+
+    def refresh(self, path, value):
+        """Like :meth:`set`, but only if ``path`` is already recorded.
+
+        :param path: path to source file
+        :type path: ``unicode``
+        :param value: value to record for ``path``
+
+        """
+        if path in self.facts:
+            self.set(path, value)
+        else:
+            self.invalidate(path)
+
+    def invalidate(self, path=None):
+        """Forget the stat result for ``path`` (or all paths).
+
+        :param path: path to source file
+        :type path: ``unicode``
+
+        """
+        if path is None:
+            self._stats.clear()
+        else:
+            self._stats.pop(path, None)
+
+    def save(self):
+        """Write snapshot to :attr:`filepath` if it has changed."""
+        if not self._dirty:
+            return
+
+        try:
+            data = marshal.dumps((self.version, self._facts), 2)
+        except ValueError:  # unmarshallable value; save the others
+            facts = {}
+            for path, fact in self._facts.items():
+                try:
+                    marshal.dumps(fact, 2)
+                except ValueError:
+                    logging.getLogger('').debug(
+                        'state of %s not saved: value is not marshallable',
+                        path)
+                    continue
+                facts[path] = fact
+            data = marshal.dumps((self.version, facts), 2)
+
+        try:
+            with atomic_writer(self.filepath, 'wb') as fp:
+                fp.write(data)
+        except (IOError, OSError):  # cache directory has gone
+            pass
+
+        self._dirty = False
+
+
 class Workflow(object):
     """The ``Workflow`` object is the main interface to Alfred-Workflow.
 
@@ -929,6 +1365,11 @@ class Workflow(object):
         also be opened directly in a web browser with the ``workflow:help``
         :ref:`magic argument <magic-arguments>`.
     :type help_url: :class:`unicode` or :class:`str`
+    :param buffered_logging: hold log records in memory and write them
+        to the log file when the workflow exits. The log file is only
+        opened if something was logged. Use this for Script Filters,
+        which run on every keystroke.
+    :type buffered_logging: :class:`Boolean`
 
     """
 
@@ -939,7 +1380,7 @@ class Workflow(object):
     def __init__(self, default_settings=None, update_settings=None,
                  input_encoding='utf-8', normalization='NFC',
                  capture_args=True, libraries=None,
-                 help_url=None):
+                 help_url=None, buffered_logging=False):
         """Create new :class:`Workflow` object."""
         self._default_settings = default_settings or {}
         self._update_settings = update_settings or {}
@@ -947,9 +1388,11 @@ class Workflow(object):
         self._normalizsation = normalization
         self._capture_args = capture_args
         self.help_url = help_url
+        self._buffered_logging = buffered_logging
         self._workflowdir = None
         self._settings_path = None
         self._settings = None
+        self._state = None
         self._bundleid = None
         self._debugging = None
         self._name = None
@@ -957,6 +1400,7 @@ class Workflow(object):
         self._data_serializer = 'cpickle'
         self._info = None
         self._info_loaded = False
+        self._info_fields = None
         self._logger = None
         self._items = []
         self._alfred_env = None
@@ -966,6 +1410,7 @@ class Workflow(object):
         self._last_version_run = UNSET
         # Cache for regex patterns created for filter keys
         self._search_pattern_cache = {}
+        self._locks = {}
         #: Prefix for all magic arguments.
         #: The default value is ``workflow:`` so keyword
         #: ``config`` would match user query ``workflow:config``.
@@ -1100,7 +1545,8 @@ class Workflow(object):
             if self.alfred_env.get('workflow_bundleid'):
                 self._bundleid = self.alfred_env.get('workflow_bundleid')
             else:
-                self._bundleid = unicode(self.info['bundleid'], 'utf-8')
+                self._bundleid = unicode(self._plist_fields['bundleid'],
+                                         'utf-8')
 
         return self._bundleid
 
@@ -1126,7 +1572,7 @@ class Workflow(object):
             if self.alfred_env.get('workflow_name'):
                 self._name = self.decode(self.alfred_env.get('workflow_name'))
             else:
-                self._name = self.decode(self.info['name'])
+                self._name = self.decode(self._plist_fields['name'])
 
         return self._name
 
@@ -1168,7 +1614,7 @@ class Workflow(object):
 
             # info.plist
             if not version:
-                version = self.info.get('version')
+                version = self._plist_fields.get('version')
 
             if version:
                 from update import Version
@@ -1357,6 +1803,13 @@ class Workflow(object):
         """
         return os.path.join(self.datadir, filename)
 
+    def _file_lock(self, path):
+        """Return :class:`~workflow.util.RWLock` protecting ``path``."""
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks[path] = RWLock(path)
+        return lock
+
     def workflowfile(self, filename):
         """Return full path to ``filename`` in workflow's root directory.
 
@@ -1387,6 +1840,10 @@ class Workflow(object):
 
         Use :meth:`open_log` to open the log file in Console.
 
+        If ``buffered_logging`` was passed to :class:`Workflow`, records
+        are written to the log file when the workflow exits (see
+        :class:`BufferedLogHandler`).
+
         :returns: an initialised :class:`~logging.Logger`
 
         """
@@ -1406,7 +1863,12 @@ class Workflow(object):
                 ' %(levelname)-8s %(message)s',
                 datefmt='%H:%M:%S')
 
-            logfile = logging.handlers.RotatingFileHandler(
+            if self._buffered_logging:
+                handler_class = BufferedLogHandler
+            else:
+                handler_class = logging.handlers.RotatingFileHandler
+
+            logfile = handler_class(
                 self.logfile,
                 maxBytes=1024 * 1024,
                 backupCount=1)
@@ -1467,9 +1929,28 @@ class Workflow(object):
         if not self._settings:
             self.logger.debug('reading settings from %s', self.settings_path)
             self._settings = Settings(self.settings_path,
-                                      self._default_settings)
+                                      self._default_settings,
+                                      self.state)
         return self._settings
 
+    @property
+    def state(self):
+        """Snapshot of files read on every run.
+
+        .. versionadded:: 1.40
+
+        Used internally to avoid re-reading settings, update status
+        and PID files that haven't changed since the last run.
+
+        :returns: shared :class:`~workflow.workflow.RunState` instance
+            for this workflow's cache directory
+
+        """
+        if not self._state:
+            self._state = RunState.for_path(
+                self.cachefile('.runstate.alfred-workflow'))
+        return self._state
+
     @property
     def cache_serializer(self):
         """Name of default cache serializer.
@@ -1571,30 +2052,35 @@ class Workflow(object):
             self.logger.debug('no data stored for `%s`', name)
             return None
 
-        with open(metadata_path, 'rb') as file_obj:
-            serializer_name = file_obj.read().strip()
+        # Open metadata and data together, so they belong together
+        with self._file_lock(metadata_path).read():
+            with open(metadata_path, 'rb') as file_obj:
+                serializer_name = file_obj.read().strip()
 
-        serializer = manager.serializer(serializer_name)
+            serializer = manager.serializer(serializer_name)
 
-        if serializer is None:
-            raise ValueError(
-                'Unknown serializer `{0}`. Register a corresponding '
-                'serializer with `manager.register()` '
-                'to load this data.'.format(serializer_name))
+            if serializer is None:
+                raise ValueError(
+                    'Unknown serializer `{0}`. Register a corresponding '
+                    'serializer with `manager.register()` '
+                    'to load this data.'.format(serializer_name))
 
-        self.logger.debug('data `%s` stored as `%s`', name, serializer_name)
+            self.logger.debug('data `%s` stored as `%s`', name,
+                              serializer_name)
 
-        filename = '{0}.{1}'.format(name, serializer_name)
-        data_path = self.datafile(filename)
+            filename = '{0}.{1}'.format(name, serializer_name)
+            data_path = self.datafile(filename)
 
-        if not os.path.exists(data_path):
-            self.logger.debug('no data stored: %s', name)
-            if os.path.exists(metadata_path):
-                os.unlink(metadata_path)
+            if not os.path.exists(data_path):
+                self.logger.debug('no data stored: %s', name)
+                if os.path.exists(metadata_path):
+                    os.unlink(metadata_path)
 
-            return None
+                return None
+
+            file_obj = open(data_path, 'rb')
 
-        with open(data_path, 'rb') as file_obj:
+        with file_obj:
             data = serializer.load(file_obj)
 
         self.logger.debug('stored data loaded: %s', data_path)
@@ -1650,117 +2136,251 @@ class Workflow(object):
                 'Invalid serializer `{0}`. Register your serializer with '
                 '`manager.register()` first.'.format(serializer_name))
 
+        lock = self._file_lock(metadata_path)
+
         if data is None:  # Delete cached data
-            delete_paths((metadata_path, data_path))
+            with lock.write():
+                delete_paths((metadata_path, data_path))
             return
 
         # Ensure write is not interrupted by SIGTERM
         @uninterruptible
         def _store():
+            # Data are saved first, so the metadata never refer to
+            # a data file that hasn't been written yet
+            with atomic_writer(data_path, 'wb', lock.write()) as file_obj:
+                serializer.dump(data, file_obj)
+
             # Save file extension
-            with atomic_writer(metadata_path, 'wb') as file_obj:
+            with atomic_writer(metadata_path, 'wb',
+                               lock.write()) as file_obj:
                 file_obj.write(serializer_name)
 
-            with atomic_writer(data_path, 'wb') as file_obj:
-                serializer.dump(data, file_obj)
-
         _store()
 
         self.logger.debug('saved data: %s', data_path)
 
-    def cached_data(self, name, data_func=None, max_age=60):
+    def cached_data(self, name, data_func=None, max_age=60,
+                    serializer=None):
         """Return cached data if younger than ``max_age`` seconds.
 
         Retrieve data from cache or re-generate and re-cache data if
         stale/non-existant. If ``max_age`` is 0, return cached data no
         matter how old.
 
+        .. versionchanged:: 1.40
+            Added ``serializer`` argument.
+
         :param name: name of datastore
         :param data_func: function to (re-)generate data.
         :type data_func: ``callable``
         :param max_age: maximum age of cached data in seconds
         :type max_age: ``int``
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
         :returns: cached data, return value of ``data_func`` or ``None``
             if ``data_func`` is not set
 
         """
-        serializer = manager.serializer(self.cache_serializer)
+        serializer_name = serializer or self.cache_serializer
+        serializer = manager.serializer(serializer_name)
 
-        cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
-        age = self.cached_data_age(name)
+        cache_path = self.cachefile('%s.%s' % (name, serializer_name))
+        age = self.cached_data_age(name, serializer_name)
 
-        if (age < max_age or max_age == 0) and os.path.exists(cache_path):
+        if (age < max_age or max_age == 0) and age:
 
             with open(cache_path, 'rb') as file_obj:
                 self.logger.debug('loading cached data: %s', cache_path)
+                read_cache_header(file_obj)
                 return serializer.load(file_obj)
 
         if not data_func:
             return None
 
         data = data_func()
-        self.cache_data(name, data)
+        self.cache_data(name, data, serializer_name)
 
         return data
 
-    def cache_data(self, name, data):
+    def cached_data_background(self, name, args, max_age=60, job=None,
+                               serializer=None, **kwargs):
+        r"""Return cached data and refresh it in the background if stale.
+
+        .. versionadded:: 1.40
+
+        Cached data are returned immediately, however old they are. If
+        the cache is older than ``max_age`` seconds or doesn't exist,
+        ``args`` is run via :func:`~workflow.background.run_in_background`
+        to regenerate it (unless job ``job`` is already running).
+
+        The cache file is only stat'ed once.
+
+        :param name: name of datastore
+        :param args: command that updates the cache (see
+            :func:`~workflow.background.run_in_background`)
+        :type args: ``list``
+        :param max_age: maximum age of cached data in seconds. If
+            ``max_age`` is 0, only start the command if there is no
+            cached data.
+        :type max_age: ``int``
+        :param job: name of background job. Defaults to ``name``.
+        :type job: ``unicode``
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
+        :param \**kwargs: keyword arguments for
+            :func:`~workflow.background.run_in_background`
+        :returns: ``(data, running)`` where ``data`` is the cached data
+            (or ``None``) and ``running`` is ``True`` if the job is
+            running, i.e. fresher data are on their way
+        :rtype: ``tuple``
+
+        """
+        from background import is_running, run_in_background
+
+        job = job or name
+        serializer_name = serializer or self.cache_serializer
+        serializer = manager.serializer(serializer_name)
+        cache_path = self.cachefile('%s.%s' % (name, serializer_name))
+        mtime = self.state.mtime(cache_path)
+
+        data = None
+        if mtime is not None:
+            with open(cache_path, 'rb') as file_obj:
+                self.logger.debug('loading cached data: %s', cache_path)
+                read_cache_header(file_obj)
+                data = serializer.load(file_obj)
+
+        if mtime is None or (max_age and time.time() - mtime >= max_age):
+            self.logger.debug('refreshing cached data: %s', name)
+            run_in_background(job, args, **kwargs)
+
+        return data, is_running(job)
+
+    def cache_data(self, name, data, serializer=None, schema=0,
+                   source=None):
         """Save ``data`` to cache under ``name``.
 
         If ``data`` is ``None``, the corresponding cache file will be
         deleted.
 
+        .. versionchanged:: 1.40
+            Added ``serializer``, ``schema`` and ``source`` arguments.
+
+        The serialized data are preceded by a :class:`CacheHeader`, which
+        can be read cheaply with :meth:`cached_data_header` to decide
+        whether the cache is compatible or out of date without loading it.
+
         :param name: name of datastore
         :param data: data to store. This may be any object supported by
                 the cache serializer
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
+        :param schema: format version of ``data``
+        :type schema: ``int``
+        :param source: hash (max. 32 ASCII characters) of whatever
+            ``data`` was generated from, e.g. relevant settings
+        :type source: ``unicode``
 
         """
-        serializer = manager.serializer(self.cache_serializer)
+        serializer_name = serializer or self.cache_serializer
+        serializer = manager.serializer(serializer_name)
 
-        cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
+        cache_path = self.cachefile('%s.%s' % (name, serializer_name))
 
         if data is None:
             if os.path.exists(cache_path):
                 os.unlink(cache_path)
                 self.logger.debug('deleted cache file: %s', cache_path)
+            self.state.invalidate(cache_path)
             return
 
+        try:
+            count = len(data)
+        except TypeError:  # data has no length
+            count = -1
+
+        header = _cache_header.pack(CACHE_MAGIC, schema, count, time.time(),
+                                    (source or '').encode('ascii'))
+
+        # Cache files are replaced atomically, so readers needn't lock
+        # them: an open file keeps its contents
         with atomic_writer(cache_path, 'wb') as file_obj:
+            file_obj.write(header)
             serializer.dump(data, file_obj)
 
+        # Only the file's age is used from the snapshot. Cached data
+        # are never stored in it: they may be large or not marshallable.
+        self.state.invalidate(cache_path)
         self.logger.debug('cached data: %s', cache_path)
 
-    def cached_data_fresh(self, name, max_age):
+    def cached_data_header(self, name, serializer=None):
+        """Return :class:`CacheHeader` of cache ``name``.
+
+        .. versionadded:: 1.40
+
+        Only the header is read, not the cached data.
+
+        :param name: name of datastore
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
+        :returns: :class:`CacheHeader` or ``None`` if the cache doesn't
+            exist or has no header
+
+        """
+        serializer_name = serializer or self.cache_serializer
+        cache_path = self.cachefile('%s.%s' % (name, serializer_name))
+
+        try:
+            with open(cache_path, 'rb') as file_obj:
+                return read_cache_header(file_obj)
+        except IOError:  # no cache
+            return None
+
+    def cached_data_fresh(self, name, max_age, serializer=None):
         """Whether cache `name` is less than `max_age` seconds old.
 
         :param name: name of datastore
         :param max_age: maximum age of data in seconds
         :type max_age: ``int``
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
         :returns: ``True`` if data is less than ``max_age`` old, else
             ``False``
 
         """
-        age = self.cached_data_age(name)
+        age = self.cached_data_age(name, serializer)
 
         if not age:
             return False
 
         return age < max_age
 
-    def cached_data_age(self, name):
+    def cached_data_age(self, name, serializer=None):
         """Return age in seconds of cache `name` or 0 if cache doesn't exist.
 
         :param name: name of datastore
         :type name: ``unicode``
+        :param serializer: name of serializer to use instead of
+            :attr:`cache_serializer`
+        :type serializer: ``unicode``
         :returns: age of datastore in seconds
         :rtype: ``int``
 
         """
-        cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
+        serializer_name = serializer or self.cache_serializer
+        cache_path = self.cachefile('%s.%s' % (name, serializer_name))
 
-        if not os.path.exists(cache_path):
+        mtime = self.state.mtime(cache_path)
+        if mtime is None:
             return 0
 
-        return time.time() - os.stat(cache_path).st_mtime
+        return time.time() - mtime
 
     def filter(self, query, items, key=lambda x: x, ascending=False,
                include_score=False, min_score=0, max_results=0,
@@ -2268,9 +2888,16 @@ class Workflow(object):
 
         """
         key = '__workflow_latest_version'
-        # Create a new workflow object to ensure standard serialiser
-        # is used (update.py is called without the user's settings)
-        status = Workflow().cached_data(key, max_age=0)
+        # Always read with the standard serialiser, as update.py
+        # is called without the user's settings
+        serializer = manager.serializer('cpickle')
+
+        def _load(path):
+            with open(path, 'rb') as file_obj:
+                read_cache_header(file_obj)
+                return serializer.load(file_obj)
+
+        status = self.state.get(self.cachefile(key + '.cpickle'), _load)
 
         # self.logger.debug('update status: %r', status)
         if not status or not status.get('available'):
@@ -2768,6 +3395,37 @@ class Workflow(object):
         self._info = plistlib.readPlist(self.workflowfile('info.plist'))
         self._info_loaded = True
 
+    @property
+    def _plist_fields(self):
+        """Bundle ID, name, version and variables from ``info.plist``.
+
+        The fields are cached in :attr:`state` against the signature
+        of ``info.plist``, so the XML is only parsed again when the
+        workflow has been updated.
+
+        """
+        if self._info_fields is None:
+            filepath = self.workflowfile('info.plist')
+            # The cache directory can only be determined without
+            # the bundle ID if Alfred has provided it
+            if self.alfred_env.get('workflow_cache'):
+                self._info_fields = self.state.get(filepath,
+                                                   self._parse_info_plist)
+            else:
+                self._info_fields = self._parse_info_plist(filepath)
+
+        return self._info_fields
+
+    def _parse_info_plist(self, filepath):
+        """Extract cacheable fields from ``info.plist`` at ``filepath``."""
+        self._load_info_plist()
+        return {
+            'bundleid': self._info.get('bundleid'),
+            'name': self._info.get('name'),
+            'version': self._info.get('version'),
+            'variables': dict(self._info.get('variables') or {}),
+        }
+
     def _create(self, dirpath):
         """Create directory `dirpath` if it doesn't exist.
 
@@ -598,7 +598,8 @@ class Workflow3(Workflow):
         """New cache name/key based on session ID."""
         return self._session_prefix + name
 
-    def cache_data(self, name, data, session=False):
+    def cache_data(self, name, data, session=False, serializer=None,
+                   schema=0, source=None):
         """Cache API with session-scoped expiry.
 
         .. versionadded:: 1.25
@@ -608,6 +609,11 @@ class Workflow3(Workflow):
             data (object): Data to cache
             session (bool, optional): Whether to scope the cache
                 to the current session.
+            serializer (str, optional): Name of serializer to use
+                instead of :attr:`cache_serializer`.
+            schema (int, optional): Format version of ``data``.
+            source (str, optional): Hash of what ``data`` was
+                generated from.
 
         ``name`` and ``data`` are the same as for the
         :meth:`~workflow.Workflow.cache_data` method on
@@ -620,9 +626,11 @@ class Workflow3(Workflow):
         if session:
             name = self._mk_session_name(name)
 
-        return super(Workflow3, self).cache_data(name, data)
+        return super(Workflow3, self).cache_data(name, data, serializer,
+                                                 schema, source)
 
-    def cached_data(self, name, data_func=None, max_age=60, session=False):
+    def cached_data(self, name, data_func=None, max_age=60, session=False,
+                    serializer=None):
         """Cache API with session-scoped expiry.
 
         .. versionadded:: 1.25
@@ -634,6 +642,8 @@ class Workflow3(Workflow):
             max_age (int): Maximum allowable age of cache in seconds.
             session (bool, optional): Whether to scope the cache
                 to the current session.
+            serializer (str, optional): Name of serializer to use
+                instead of :attr:`cache_serializer`.
 
         ``name``, ``data_func`` and ``max_age`` are the same as for the
         :meth:`~workflow.Workflow.cached_data` method on
@@ -646,7 +656,8 @@ class Workflow3(Workflow):
         if session:
             name = self._mk_session_name(name)
 
-        return super(Workflow3, self).cached_data(name, data_func, max_age)
+        return super(Workflow3, self).cached_data(name, data_func, max_age,
+                                                  serializer)
 
     def clear_session_cache(self, current=False):
         """Remove session data from the cache.
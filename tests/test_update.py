@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Tests for saving repos from `update.py`.
+
+Run with ``python -m unittest discover tests``.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from workflow import Workflow3  # noqa: E402
+
+import update  # noqa: E402
+from journal import ADDED, REMOVED, Journal  # noqa: E402
+from repostore import Repo  # noqa: E402
+
+
+class UpdateReposTest(unittest.TestCase):
+    """Full updates and watcher rescans saving the same repos."""
+
+    def setUp(self):
+        """Create workflow with temporary data and cache directories."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = os.environ.copy()
+        os.environ.update({
+            'alfred_workflow_bundleid': 'net.deanishe.alfred-git-repos',
+            'alfred_workflow_cache': os.path.join(self.tmpdir, 'cache'),
+            'alfred_workflow_data': os.path.join(self.tmpdir, 'data'),
+            'alfred_version': '4.0',
+        })
+        self.cwd = os.getcwd()
+        os.chdir(SRC)
+        self.wf = Workflow3()
+        update.log = self.wf.logger
+
+    def tearDown(self):
+        """Delete temporary directories."""
+        os.chdir(self.cwd)
+        os.environ.clear()
+        os.environ.update(self.env)
+        shutil.rmtree(self.tmpdir)
+
+    def test_watcher_save_during_full_update(self):
+        """Full update waits for watcher and diffs against its repos."""
+        a = Repo('a', '/src/a')
+        watched = Repo('w', '/src/w')
+        found = Repo('f', '/src/f')
+        update.update_repos(self.wf, lambda previous: [a])
+
+        ready, locked = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # watcher
+            status = 1
+            try:
+                def rescan(previous):
+                    os.write(locked, b'x')
+                    # Give the full update time to try to save
+                    time.sleep(0.5)
+                    return previous + [watched]
+
+                update.update_repos(Workflow3(), rescan)
+                status = 0
+            finally:
+                os._exit(status)
+
+        # Full update finishes while the watcher is rescanning
+        os.read(ready, 1)
+        update.update_repos(self.wf, lambda previous: [a, found])
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+        self.assertEqual(update.load_repos(Workflow3()), [a, found])
+        records = Journal(self.wf.cachedir).records
+        self.assertEqual([r[0] for r in records], [1, 2, 3])
+        self.assertEqual(records[1][2], [(ADDED, tuple(watched))])
+        self.assertEqual(records[2][2],
+                         [(REMOVED, watched.path), (ADDED, tuple(found))])
+
+    def test_rescan_without_changes(self):
+        """Nothing is saved if the watcher finds no changes."""
+        a = Repo('a', '/src/a')
+        update.update_repos(self.wf, lambda previous: [a])
+        self.assertIsNone(update.update_repos(self.wf, lambda previous: None))
+        self.assertEqual(Journal(self.wf.cachedir).generation, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
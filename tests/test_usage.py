@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# Copyright (c) 2026 deanishe@deanishe.net
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+# Created on 2026-10-19
+#
+
+"""Tests for `usage.py`.
+
+Run with ``python -m unittest discover tests``.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from usage import Usage  # noqa: E402
+
+NOW = 1800000000.0
+
+
+class CompactTest(unittest.TestCase):
+    """Compacting the log into the table."""
+
+    def setUp(self):
+        """Create `Usage` in a temporary directory."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.usage = Usage(self.tmpdir)
+        self.tmp = self.usage.log_path + '.compact'
+
+    def tearDown(self):
+        """Delete temporary directory."""
+        shutil.rmtree(self.tmpdir)
+
+    def test_compact(self):
+        """Scores are the same before and after compacting."""
+        self.usage.record('/a', NOW - 10)
+        self.usage.record('/a', NOW - 5)
+        self.usage.record('/b', NOW - 1)
+        before = self.usage.score('/a', NOW), self.usage.score('/b', NOW)
+
+        self.usage.compact(NOW)
+        self.assertFalse(os.path.exists(self.usage.log_path))
+        self.assertAlmostEqual(self.usage.score('/a', NOW), before[0])
+        self.assertAlmostEqual(self.usage.score('/b', NOW), before[1])
+
+    def test_interrupted_before_merge(self):
+        """Opens in log left by interrupted compaction are kept."""
+        self.usage.record('/a', NOW - 10)
+        # Compaction crashed after moving the log out of the way
+        os.rename(self.usage.log_path, self.tmp)
+        self.usage.record('/a', NOW - 5)
+        self.usage.record('/b', NOW - 1)
+
+        self.usage.compact(NOW)
+        self.assertFalse(os.path.exists(self.tmp))
+        self.assertGreater(self.usage.score('/a', NOW), 1.9)
+        self.assertGreater(self.usage.score('/b', NOW), 0.9)
+
+    def test_interrupted_after_merge(self):
+        """Opens merged by interrupted compaction aren't counted twice."""
+        self.usage.record('/a', NOW - 10)
+        with open(self.usage.log_path, 'rb') as fp:
+            data = fp.read()
+        self.usage.compact(NOW)
+        # Compaction crashed after writing the table
+        with open(self.tmp, 'wb') as fp:
+            fp.write(data)
+
+        self.usage.compact(NOW)
+        self.assertFalse(os.path.exists(self.tmp))
+        self.assertLess(self.usage.score('/a', NOW), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()